@@ -1,12 +1,25 @@
 from .occam_data import OccamData
+from .occam_ensemble import OccamEnsemble
 from .read_fort1 import Fort1
 from .read_fort7 import Fort7
-from .read_xyz import Xyz
-from .generate_fort5 import generate_uniform_random, generate_fcc
+from .read_xyz import Xyz, XyzIndex
+from .chunked_array import ChunkedArray
+from .generate_fort5 import (generate_uniform_random, generate_fcc,
+                             generate_lattice, generate_random_packing)
 from .replace_in_fort1 import replace_in_fort1
 from .replace_in_fort3 import Fort3Replacement, replace_in_fort3
-from .histogram import histogram
+from .histogram import (histogram, density_histogram,
+                        HistogramAccumulator)
+from .neighbor_list import (minimum_image, neighbor_pairs, CellList,
+                            VerletList)
+from .rdf import rdf
+from .msd import msd
+from .correlation import correlation, autocorrelation, vacf
 
-__all__ = ['OccamData', 'Fort1', 'Fort7', 'Xyz', 'generate_uniform_random',
-           'generate_fcc', 'replace_in_fort1', 'Fort3Replacement',
-           'replace_in_fort3', 'histogram']
+__all__ = ['OccamData', 'OccamEnsemble', 'Fort1', 'Fort7', 'Xyz', 'XyzIndex',
+           'ChunkedArray', 'generate_uniform_random', 'generate_fcc',
+           'generate_lattice', 'generate_random_packing', 'replace_in_fort1',
+           'Fort3Replacement', 'replace_in_fort3',
+           'histogram', 'density_histogram', 'HistogramAccumulator',
+           'rdf', 'msd', 'correlation', 'autocorrelation', 'vacf',
+           'minimum_image', 'neighbor_pairs', 'CellList', 'VerletList']
@@ -0,0 +1,249 @@
+import os
+import json
+import zlib
+import shutil
+import itertools as it
+import numpy as np
+
+
+def _shuffle(array):
+    # Group the bytes of the elements by significance. The high bytes of
+    # similar numbers are mostly equal, which compresses much better than
+    # the interleaved bytes.
+    array = np.ascontiguousarray(array)
+    return np.ascontiguousarray(
+        array.reshape(-1).view(np.uint8).reshape(-1, array.itemsize).T
+    ).tobytes()
+
+
+def _unshuffle(buffer, dtype):
+    dtype = np.dtype(dtype)
+    array = np.frombuffer(buffer, dtype=np.uint8).reshape(dtype.itemsize, -1)
+    return np.ascontiguousarray(array.T).view(dtype).reshape(-1)
+
+
+def _default_chunks(shape, itemsize, chunk_bytes=2**20):
+    # Up to 2**14 elements along the particle axes, and as many frames as
+    # fit in about chunk_bytes (uncompressed).
+    chunks = tuple(max(1, min(n, 2**14)) for n in shape[1:])
+    n_frames = chunk_bytes // (itemsize * int(np.prod(chunks, dtype=int)))
+    return (max(1, n_frames),) + chunks
+
+
+class ChunkedArray:
+    # Array stored as a directory of separately compressed chunks, with the
+    # shape, dtype, and chunk shape in a json file. Indexing with integers
+    # and slices reads only the chunks overlapping the selection.
+    extension = '.chunks'
+    meta_file = 'meta.json'
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, self.meta_file), 'r') as in_file:
+            meta = json.load(in_file)
+        self.shape = tuple(meta['shape'])
+        self.dtype = np.dtype(meta['dtype'])
+        self.chunks = tuple(meta['chunks'])
+        self.level = meta['level']
+        self.precision = meta['precision']
+        self._cache = (None, None)
+
+    @classmethod
+    def create(cls, path, array, chunks=None, level=6, precision=None):
+        # Floating point arrays are stored losslessly, unless a precision is
+        # given: the values are then rounded to multiples of precision and
+        # stored as integers, which compresses several times better.
+        array = np.asarray(array)
+        if array.ndim == 0:
+            raise ValueError('ChunkedArray can not store a 0-d array')
+        if chunks is None:
+            chunks = _default_chunks(array.shape, array.itemsize)
+        chunks = tuple(chunks)
+        if (len(chunks) != array.ndim
+                or not all(isinstance(c, int) and c >= 1 for c in chunks)):
+            raise ValueError(f'chunks must be {array.ndim} positive integers, '
+                             f'not {chunks}')
+        if precision is not None:
+            if array.dtype.kind != 'f':
+                raise TypeError(f'precision can only be used with floating '
+                                f'point arrays, not {array.dtype}')
+            if not precision > 0:
+                raise ValueError(f'precision must be positive, not '
+                                 f'{precision}')
+
+        # The chunks are written to a temporary directory which then replaces
+        # any existing array.
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.mkdir(tmp_path)
+        chunked = cls.__new__(cls)
+        chunked.path = tmp_path
+        chunked.shape = array.shape
+        chunked.dtype = array.dtype
+        chunked.chunks = chunks
+        chunked.level = level
+        chunked.precision = precision
+        chunked._cache = (None, None)
+        chunked._write_rows(array, 0)
+        chunked._save_meta()
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(tmp_path, path)
+        chunked.path = path
+        return chunked
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape, dtype=int))
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return (f'ChunkedArray({self.path!r}, shape={self.shape}, '
+                f'dtype={self.dtype}, chunks={self.chunks})')
+
+    def __array__(self, dtype=None, copy=None):
+        array = self[...]
+        if dtype is not None:
+            array = array.astype(dtype)
+        return array
+
+    def astype(self, dtype):
+        return self[...].astype(dtype)
+
+    def _save_meta(self):
+        meta = {'shape': list(self.shape), 'dtype': self.dtype.str,
+                'chunks': list(self.chunks), 'level': self.level,
+                'precision': self.precision, 'compression': 'zlib',
+                'shuffle': True}
+        tmp_file_name = os.path.join(self.path, self.meta_file + '.tmp')
+        with open(tmp_file_name, 'w') as out_file:
+            json.dump(meta, out_file)
+        os.replace(tmp_file_name, os.path.join(self.path, self.meta_file))
+
+    def _chunk_file(self, chunk_index):
+        return os.path.join(self.path, '.'.join(str(i) for i in chunk_index))
+
+    def _write_chunk(self, chunk_index, block):
+        if self.precision is not None:
+            block = np.round(block / self.precision).astype(np.int64)
+        with open(self._chunk_file(chunk_index), 'wb') as out_file:
+            out_file.write(zlib.compress(_shuffle(block), self.level))
+        if self._cache[0] == chunk_index:
+            self._cache = (None, None)
+
+    def _read_chunk(self, chunk_index):
+        if self._cache[0] == chunk_index:
+            return self._cache[1]
+        chunk_shape = tuple(
+            min(c, n - i * c)
+            for i, c, n in zip(chunk_index, self.chunks, self.shape)
+        )
+        with open(self._chunk_file(chunk_index), 'rb') as in_file:
+            buffer = zlib.decompress(in_file.read())
+        if self.precision is not None:
+            block = _unshuffle(buffer, np.int64)
+        else:
+            block = _unshuffle(buffer, self.dtype)
+        # The last chunk along the first axis may hold more rows than the
+        # shape in the json file, if an append was interrupted.
+        block = block.reshape((-1,) + chunk_shape[1:])[:chunk_shape[0]]
+        if self.precision is not None:
+            block = (block * self.precision).astype(self.dtype)
+        self._cache = (chunk_index, block)
+        return block
+
+    def _write_rows(self, array, start):
+        # Write the rows of array starting at row start, which must be at a
+        # chunk boundary along the first axis.
+        corners = it.product(*[range(0, n, c) for n, c in
+                               zip(array.shape[1:], self.chunks[1:])])
+        for corner in corners:
+            for t in range(0, len(array), self.chunks[0]):
+                index = (slice(t, t + self.chunks[0]),) + tuple(
+                    slice(c, c + size)
+                    for c, size in zip(corner, self.chunks[1:])
+                )
+                chunk_index = ((start + t) // self.chunks[0],) + tuple(
+                    c // size for c, size in zip(corner, self.chunks[1:])
+                )
+                self._write_chunk(chunk_index, array[index])
+
+    def append(self, array):
+        # Append rows along the first axis, rewriting only the last chunk if
+        # it is partially filled.
+        array = np.asarray(array, dtype=self.dtype)
+        if array.shape[1:] != self.shape[1:]:
+            raise ValueError(f'Can not append array of shape {array.shape} '
+                             f'to ChunkedArray of shape {self.shape}')
+        start = (self.shape[0] // self.chunks[0]) * self.chunks[0]
+        if start < self.shape[0]:
+            array = np.concatenate((self[start:], array))
+        self._write_rows(array, start)
+        self.shape = (start + len(array),) + self.shape[1:]
+        self._save_meta()
+
+    def _normalize_key(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        n_ellipsis = sum(k is Ellipsis for k in key)
+        if n_ellipsis > 1:
+            raise IndexError('an index can only have a single ellipsis')
+        if n_ellipsis == 1:
+            i = [k is Ellipsis for k in key].index(True)
+            fill = (slice(None),) * (self.ndim - len(key) + 1)
+            key = key[:i] + fill + key[i + 1:]
+        if len(key) > self.ndim:
+            raise IndexError(f'too many indices for ChunkedArray: array is '
+                             f'{self.ndim}-dimensional, but {len(key)} were '
+                             f'indexed')
+        return key + (slice(None),) * (self.ndim - len(key))
+
+    def __getitem__(self, key):
+        indices = []
+        squeeze = []
+        for k, n in zip(self._normalize_key(key), self.shape):
+            if isinstance(k, (int, np.integer)):
+                i = int(k) + n if k < 0 else int(k)
+                if not 0 <= i < n:
+                    raise IndexError(f'index {k} is out of bounds for axis '
+                                     f'with size {n}')
+                indices.append(range(i, i + 1))
+                squeeze.append(0)
+            elif isinstance(k, slice):
+                indices.append(range(*k.indices(n)))
+                squeeze.append(slice(None))
+            else:
+                raise TypeError(f'ChunkedArray indices must be integers or '
+                                f'slices, not {type(k).__name__}')
+
+        # Read the box spanned by the selection, chunk by chunk, then pick
+        # out the selected elements when using steps.
+        lo = [min(r, default=0) for r in indices]
+        hi = [max(r, default=-1) + 1 for r in indices]
+        out = np.empty([h - low for low, h in zip(lo, hi)], dtype=self.dtype)
+        if out.size > 0:
+            chunk_ranges = [range(low // c, (h - 1) // c + 1)
+                            for low, h, c in zip(lo, hi, self.chunks)]
+            for chunk_index in it.product(*chunk_ranges):
+                start = [i * c for i, c in zip(chunk_index, self.chunks)]
+                block = self._read_chunk(chunk_index)
+                a = [max(low, s) for low, s in zip(lo, start)]
+                b = [min(h, s + size)
+                     for h, s, size in zip(hi, start, block.shape)]
+                out[tuple(slice(i - low, j - low) for i, j, low in
+                          zip(a, b, lo))] = block[tuple(
+                              slice(i - s, j - s)
+                              for i, j, s in zip(a, b, start))]
+        if any(r.step != 1 for r in indices):
+            out = out[np.ix_(*[np.asarray(r, dtype=int) - low
+                               for r, low in zip(indices, lo)])]
+        return out[tuple(squeeze)]
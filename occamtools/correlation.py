@@ -0,0 +1,102 @@
+import numpy as np
+from occamtools.histogram import _check_dimensions
+from occamtools.rdf import _check_data, _type_indices
+
+
+def _correlation_sum(a, b=None, axis=0):
+    # Sums over time origins t of a(t) b(t + m) for lags m from 0 to n - 1
+    # along axis, for all other axes at once, with zero-padded FFTs in
+    # O(T log T). b=None gives the autocorrelation of a.
+    n = a.shape[axis]
+    n_fft = 2 ** int(np.ceil(np.log2(2 * max(n, 1))))
+    fa = np.fft.rfft(a, n=n_fft, axis=axis)
+    if b is None:
+        product = fa.real**2 + fa.imag**2
+    else:
+        product = np.conj(fa) * np.fft.rfft(b, n=n_fft, axis=axis)
+    result = np.fft.irfft(product, n=n_fft, axis=axis)
+    return np.take(result, np.arange(n), axis=axis)
+
+
+def _n_origins(n, ndim, axis):
+    # Number of time origins for each lag, shaped to broadcast along axis.
+    shape = [1] * ndim
+    shape[axis] = n
+    return np.arange(n, 0, -1).reshape(shape)
+
+
+def _particle_chunks(data, ids, dims, max_values):
+    # Yields lists of arrays of shape (n_frames, n_chunk), one per array in
+    # dims (of data.x, data.y, data.z, data.vx, ...), for chunks of the
+    # sorted particles ids. Columns are read as slices, as memory-mapped or
+    # chunked arrays are sliced much faster than indexed, so each chunk holds
+    # the particles within a span of at most max_values // n_frames columns
+    # (fewer particles for sparse selections), keeping every read bounded.
+    chunk = max(max_values // max(len(getattr(data, dims[0])), 1), 1)
+    start = 0
+    while start < len(ids):
+        stop = int(np.searchsorted(ids, ids[start] + chunk))
+        selection = ids[start:stop]
+        columns = slice(selection[0], selection[-1] + 1)
+        yield [np.asarray(getattr(data, d)[:, columns],
+                          dtype=np.float64)[:, selection - selection[0]]
+               for d in dims]
+        start = stop
+
+
+def correlation(a, b=None, axis=0, subtract_mean=False, normalize=False):
+    # Time correlation <a(t) b(t + m)> averaged over all time origins t, for
+    # lags m from 0 to n - 1 along axis (e.g. time series of shape (T,) or
+    # (T, N), correlated column by column), computed with FFTs. b=None gives
+    # the autocorrelation of a. With subtract_mean, the means along axis are
+    # subtracted first (e.g. for fluctuations of the pressure in Green-Kubo
+    # integrals), and with normalize the result is divided by its value at
+    # lag 0.
+    a = np.asarray(a, dtype=np.float64)
+    if b is not None:
+        b = np.asarray(b, dtype=np.float64)
+        if b.shape != a.shape:
+            error_str = (f'The series must have the same shape, not '
+                         f'{a.shape} and {b.shape}.')
+            raise ValueError(error_str)
+    if a.ndim == 0 or a.shape[axis] == 0:
+        raise ValueError(f'Can not correlate series of shape {a.shape} along '
+                         f'axis {axis}.')
+    if subtract_mean:
+        a = a - a.mean(axis=axis, keepdims=True)
+        if b is not None:
+            b = b - b.mean(axis=axis, keepdims=True)
+    corr = (_correlation_sum(a, b, axis=axis)
+            / _n_origins(a.shape[axis], a.ndim, axis))
+    if normalize:
+        corr = corr / np.take(corr, [0], axis=axis)
+    return corr
+
+
+def autocorrelation(a, axis=0, subtract_mean=False, normalize=False):
+    return correlation(a, axis=axis, subtract_mean=subtract_mean,
+                       normalize=normalize)
+
+
+def vacf(data, type_name=None, dimensions='xyz', normalize=False,
+         max_values=2**22):
+    # Velocity autocorrelation <v(t) . v(t + m)> of the particles of
+    # type_name (a name in data.type_dict, all particles if None) along
+    # dimensions, averaged over particles and all time origins, for lags of
+    # m frames. Particles are processed in chunks of at most about
+    # max_values values per dimension.
+    _check_data(data)
+    if not getattr(data, 'velocities', False):
+        raise ValueError('No velocities found in the trajectory.')
+    dims = ['v' + 'xyz'[d] for d in _check_dimensions(dimensions)]
+    ids = _type_indices(data, type_name)
+    n_frames = len(data.vx)
+    if n_frames == 0 or len(ids) == 0:
+        raise ValueError(f'No velocities found for type {type_name!r}.')
+
+    total = np.zeros(n_frames)
+    for velocities in _particle_chunks(data, ids, dims, max_values):
+        for v in velocities:
+            total += _correlation_sum(v).sum(axis=1)
+    corr = total / (_n_origins(n_frames, 1, 0) * len(ids))
+    return corr / corr[0] if normalize else corr
@@ -1,3 +1,4 @@
+import numpy as np
 
 
 def _convert_file_name(in_file_name):
@@ -11,41 +12,38 @@ def _convert_file_name(in_file_name):
 
 
 def _ensure_inside_box(x, box, wrap):
+    # Wraps the coordinates x (a number or an array) into the box, keeping
+    # values in (0, box] for positive x and in [0, box) for negative x, in
+    # O(1) per coordinate regardless of how many box lengths away they are.
     if wrap:
-        while x > box:
-            x -= box
-        while x < 0.0:
-            x += box
+        wrapped = np.mod(x, box)
+        x = np.where((wrapped == 0.0) & (np.asarray(x) > 0.0), box, wrapped)
     return x
 
 
 def fort5_to_xyz(file_name, wrap=True):
     xyz_file_name = _convert_file_name(file_name)
 
-    with open(file_name, 'r') as in_file, open(xyz_file_name, 'w') as out_file:
-        for _ in range(2):
-            line = in_file.readline().split()
-        box = [float(line[i]) for i in range(3)]
-
-        for _ in range(2):
-            line = in_file.readline().strip()
-        n_particles = int(line)
-
+    with open(file_name, 'r') as in_file:
+        lines = in_file.read().splitlines()
+    box = [float(lines[1].split()[i]) for i in range(3)]
+    n_particles = int(lines[3].strip())
+
+    # Each particle is given by a molecule header, the number of atoms, and
+    # the atom line.
+    atoms = lines[6:6 + 3 * n_particles:3]
+    labels = [atom.split(None, 2)[1] for atom in atoms]
+    # Fortran scientific float output gives 1.2345D+02, convert to 1.2345E+02
+    # to allow python to parse it as a float.
+    positions = np.loadtxt([atom.replace('D', 'E') for atom in atoms],
+                           usecols=(4, 5, 6), ndmin=2)
+    positions = np.stack([_ensure_inside_box(positions[:, i], box[i], wrap)
+                          for i in range(3)], axis=1)
+
+    with open(xyz_file_name, 'w') as out_file:
         out_file.write(f'{n_particles}\n')
         out_file.write(f'# box: {box[0]:.15f} {box[1]:.15f} {box[2]:.15f}\n')
-
-        for i in range(n_particles):
-            for _ in range(3):
-                line = in_file.readline()
-            line = line.split()
-            label = line[1]
-            out_file.write(f'{label} ')
-            for i, p in enumerate(line[4:7]):
-                # Fortran scientific float output gives 1.2345D+02, convert to
-                # 1.2345E+02 to allow python to parse it as a float.
-                p = float(p.replace('D', 'E'))
-                out_file.write('{pos:.15f} '.format(
-                    pos=_ensure_inside_box(p, box[i], wrap))
-                )
-            out_file.write('\n')
+        line_format = '{} {:.15f} {:.15f} {:.15f} \n'.format
+        out_file.write(''.join(map(line_format, labels,
+                                   *positions.T.tolist())))
     return xyz_file_name
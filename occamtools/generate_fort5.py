@@ -1,6 +1,8 @@
 import os
-import numpy as np
 import itertools as it
+import numpy as np
+from occamtools.neighbor_list import (minimum_image, neighbor_pairs,
+                                      cell_index, flat_cell_index)
 
 
 def _check_if_path(path, append='fort.5'):
@@ -23,12 +25,20 @@ def _write_n_particles(out_file, n_particles):
     out_file.write(f'{n_particles}\n')
 
 
-def _fcc_unit_cell(x, y, z, lattice_constant):
-    r1 = 0.5 * lattice_constant * np.asarray([0, 0, 0])
-    r2 = 0.5 * lattice_constant * np.asarray([1, 1, 0])
-    r3 = 0.5 * lattice_constant * np.asarray([0, 1, 1])
-    r4 = 0.5 * lattice_constant * np.asarray([1, 0, 1])
-    return r1, r2, r3, r4
+# Atom positions in the unit cell (as fractions of the cell lengths), and
+# the cell lengths in units of the lattice constant. The HCP cell is the
+# orthorhombic cell of two hexagonal cells, with the ideal c/a ratio.
+_lattice_bases = {
+    'sc': ([[0, 0, 0]], [1, 1, 1]),
+    'bcc': ([[0, 0, 0], [0.5, 0.5, 0.5]], [1, 1, 1]),
+    'fcc': ([[0, 0, 0], [0.5, 0.5, 0], [0, 0.5, 0.5], [0.5, 0, 0.5]],
+            [1, 1, 1]),
+    'diamond': ([[0, 0, 0], [0.5, 0.5, 0], [0, 0.5, 0.5], [0.5, 0, 0.5],
+                 [0.25, 0.25, 0.25], [0.75, 0.75, 0.25],
+                 [0.25, 0.75, 0.75], [0.75, 0.25, 0.75]], [1, 1, 1]),
+    'hcp': ([[0, 0, 0], [0.5, 0.5, 0], [0.5, 1 / 6, 0.5],
+             [0, 2 / 3, 0.5]], [1, np.sqrt(3), np.sqrt(8 / 3)]),
+}
 
 
 def _write_molecule(out_file, number, x, y, z, atoms_per_mol=1, label='Ar',
@@ -46,6 +56,62 @@ def _write_molecule(out_file, number, x, y, z, atoms_per_mol=1, label='Ar',
     out_file.write('\n')
 
 
+def _template_field(value):
+    # Placeholder for a per particle value, or the value itself (with braces
+    # escaped) if it is the same for all particles.
+    if np.ndim(value) == 0:
+        return f'{value}'.replace('{', '{{').replace('}', '}}')
+    return '{}'
+
+
+def _float_column(values):
+    # values and the template placeholder for them, with 15 decimals. If the
+    # values repeat (e.g. on a lattice), each distinct value is formatted
+    # only once, and the strings are used instead.
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    bits = values.view(np.int64)
+    if 2 * len(np.unique(bits[:1024])) > min(len(bits), 1024):
+        return values.tolist(), '{:.15f}'
+    unique, inverse = np.unique(bits, return_inverse=True)
+    formatted = np.array(list(map('{:.15f}'.format,
+                                  unique.view(np.float64).tolist())),
+                         dtype=object)
+    return formatted[inverse].tolist(), '{}'
+
+
+def _write_molecules(out_file, x, y, z, label='Ar', label_index=1,
+                     velocity=False, n_bond=0, bonds=(0, 0, 0, 0, 0, 0),
+                     first=1, chunk=2**16):
+    # Writes the same records as _write_molecule for all particles at once,
+    # numbered from first. label, label_index, and n_bond may be given per
+    # particle, and bonds as an array of shape (n_particles, 6). Values
+    # equal for all particles are built into the record template, and the
+    # records are formatted in one pass per chunk of particles.
+    n_particles = len(x)
+    bonds = np.asarray(bonds)
+    if bonds.ndim == 2:
+        bonds = bonds.T
+    fields = [label, label_index, n_bond] + list(bonds)
+    head = [f for f in fields[:3] if np.ndim(f) > 0]
+    tail = [f for f in fields[3:] if np.ndim(f) > 0]
+    for start in range(0, n_particles, chunk):
+        stop = min(start + chunk, n_particles)
+        numbers = range(first + start, first + stop)
+        positions = [_float_column(p[start:stop]) for p in (x, y, z)]
+        template = ''.join((
+            'Molecule # {}\n1\n{} ',
+            ' '.join(_template_field(f) for f in fields[:3]), ' ',
+            ' '.join(spec for _, spec in positions), ' ',
+            '0 0 0 ' if velocity else '',
+            ' '.join(_template_field(f) for f in fields[3:]), '\n',
+        ))
+        columns = ([numbers, numbers]
+                   + [np.asarray(f[start:stop]).tolist() for f in head]
+                   + [values for values, _ in positions]
+                   + [np.asarray(f[start:stop]).tolist() for f in tail])
+        out_file.write(''.join(map(template.format, *columns)))
+
+
 def generate_uniform_random(n_particles, box, path=''):
     file_name = _check_if_path(path)
 
@@ -58,40 +124,190 @@ def generate_uniform_random(n_particles, box, path=''):
 
         _write_box(out_file, box)
         _write_n_particles(out_file, n_particles)
+        _write_molecules(out_file, x, y, z)
 
-        for i in range(n_particles):
-            _write_molecule(out_file, i+1, x[i], y[i], z[i])
 
+def _random_packing(n_particles, box, min_distance, max_attempts):
+    # Random sequential addition of n_particles positions at least
+    # min_distance apart, in batches of candidates. The accepted positions
+    # are kept in a spatial hash grid of cells at least min_distance wide
+    # (slots of particle indices, -1 if empty), so that each candidate is
+    # checked only against the particles in the neighbouring cells, in O(1).
+    # Of candidates too close to each other, only the first is kept. The
+    # batch size follows the acceptance rate, which drops towards jamming.
+    volume = float(np.prod(box))
+    size = max(min_distance, (volume / max(2 * n_particles, 1))**(1 / 3))
+    n_cells = np.maximum((box / size).astype(np.int64), 1)
+    grid = np.full((int(np.prod(n_cells)), 1), -1, dtype=np.int64)
+    fill = np.zeros(len(grid), dtype=np.int64)
+    shifts = sorted(it.product(*[np.unique(np.mod([-1, 0, 1], n))
+                                 for n in n_cells]),
+                    key=np.count_nonzero)
+    positions = np.zeros((n_particles, 3))
+    n_placed, attempts, acceptance = 0, 0, 1.0
 
-def generate_fcc(cell_box, lattice_constant, velocity=False, path=''):
+    while n_placed < n_particles:
+        if attempts >= max_attempts:
+            raise ValueError(f"Could only place {n_placed} of {n_particles} "
+                             f"particles at least {min_distance} apart in "
+                             f"{attempts} attempts, the density is too high "
+                             f"for random packing.")
+        remaining = n_particles - n_placed
+        batch = int(min(max(remaining / acceptance, 64), 2**18,
+                        max_attempts - attempts))
+        attempts += batch
+        candidates = np.random.uniform(low=0.0, high=box, size=(batch, 3))
+        cell = cell_index(candidates, box, n_cells)
+
+        # Candidates are dropped as soon as they are too close to a particle
+        # in one of the cells, starting with their own.
+        for shift in shifts:
+            others = grid[flat_cell_index(np.mod(cell + shift, n_cells),
+                                          n_cells)]
+            i, slot = np.nonzero(others >= 0)
+            d = minimum_image(positions[others[i, slot]] - candidates[i], box)
+            accepted = np.ones(len(candidates), dtype=bool)
+            accepted[i[np.einsum('ij,ij->i', d, d) < min_distance**2]] = False
+            candidates, cell = candidates[accepted], cell[accepted]
+        if len(candidates) > 1:
+            _, j, _ = neighbor_pairs(candidates, box=box, cutoff=min_distance)
+            accepted = np.ones(len(candidates), dtype=bool)
+            accepted[j] = False
+            candidates, cell = candidates[accepted], cell[accepted]
+        candidates, cell = candidates[:remaining], cell[:remaining]
+        acceptance = max(len(candidates) / batch, 1e-3)
+
+        # Store the new particles in the next free slots of their cells,
+        # adding slots when a cell is full.
+        flat = flat_cell_index(cell, n_cells)
+        order = np.argsort(flat, kind='stable')
+        flat = flat[order]
+        first = np.searchsorted(flat, flat)
+        slot = fill[flat] + np.arange(len(flat)) - first
+        if len(slot) and slot.max() >= grid.shape[1]:
+            grid = np.pad(grid, ((0, 0), (0, slot.max() + 1 - grid.shape[1])),
+                          constant_values=-1)
+        ids = n_placed + np.arange(len(candidates))
+        positions[ids] = candidates
+        grid[flat, slot] = ids[order]
+        fill += np.bincount(flat, minlength=len(fill))
+        n_placed += len(candidates)
+    return positions
+
+
+def generate_random_packing(n_particles, box, min_distance, path='',
+                            max_attempts=None):
+    # Like generate_uniform_random, but with no two particles closer than
+    # min_distance (the minimum image distance), by random sequential
+    # addition. This reaches volume fractions of spheres of diameter
+    # min_distance up to about 0.3 (the jamming limit is 0.38), taking a few
+    # seconds per 10^5 particles. Raises ValueError after max_attempts (by
+    # default 100 per particle) random positions.
     file_name = _check_if_path(path)
-    x_box, y_box, z_box = cell_box
+    box = np.asarray(box, dtype=np.float64)
+    if not 0 < min_distance <= box.min() / 2:
+        raise ValueError(f"min_distance must be positive and at most half "
+                         f"the shortest box length, {box.min() / 2}, not "
+                         f"{min_distance}.")
+    if max_attempts is None:
+        max_attempts = 100 * n_particles + 1000
+    positions = _random_packing(n_particles, box, min_distance, max_attempts)
+
+    with open(file_name, 'w') as out_file:
+        _write_box(out_file, box)
+        _write_n_particles(out_file, n_particles)
+        _write_molecules(out_file, *positions.T)
+    return n_particles
 
+
+def _check_cell_box(cell_box):
     # Make sure the cell_box argument consists of only positive integers or
     # positive floats with .0 appended.
     if (any([x != int(x) for x in cell_box])
             or any([x < 0 for x in cell_box])):
         raise ValueError("The cell_box can only contain positive integers, not"
                          f" [{cell_box[0]} {cell_box[1]} {cell_box[2]}].")
-    b = lattice_constant
-    n_particles = 4 * x_box * y_box * z_box
+    return [int(x) for x in cell_box]
 
-    with open(file_name, 'w') as out_file:
-        _write_box(out_file, b * np.asarray(cell_box))
-        _write_n_particles(out_file, n_particles)
 
-        atom_counter = 1
-        for (i, j, k) in it.product(range(int(x_box)),
-                                    range(int(y_box)),
-                                    range(int(z_box))):
-            x, y, z = [b * dim for dim in (i, j, k)]
-            R = _fcc_unit_cell(x, y, z, b)
+def _lattice_labels(species, n_basis, n_cells):
+    # Label of every site, cells outermost, from one label for all sites or
+    # one per basis site.
+    if isinstance(species, str):
+        species = [species] * n_basis
+    if len(species) != n_basis:
+        raise ValueError(f"species must be a label or {n_basis} labels (one "
+                         f"per basis site), not {species}.")
+    return np.tile(np.asarray(species, dtype=object), n_cells)
+
+
+def _modify_sites(labels, vacancies, substitutions):
+    # Randomly replaces fractions of the sites by other species (a dict of
+    # label: fraction), and removes a fraction vacancies of the sites.
+    # Returns the kept sites and their labels.
+    fractions = [vacancies] + list(substitutions.values())
+    if any(not 0.0 <= f <= 1.0 for f in fractions) or sum(fractions) > 1.0:
+        raise ValueError(f"vacancies and substitutions must be fractions "
+                         f"adding up to at most 1, not {vacancies} and "
+                         f"{substitutions}.")
+    n_sites = len(labels)
+    sites = np.random.permutation(n_sites)
+    start = int(round(vacancies * n_sites))
+    labels = labels.copy()
+    for label, fraction in substitutions.items():
+        stop = start + int(round(fraction * n_sites))
+        labels[sites[start:min(stop, n_sites)]] = label
+        start = stop
+    keep = np.ones(n_sites, dtype=bool)
+    keep[sites[:int(round(vacancies * n_sites))]] = False
+    return keep, labels[keep]
+
 
-            for l in range(4):
-                r = R[l]
-                xi, yj, zk = np.asarray(r) + np.asarray([x, y, z])
+def generate_lattice(cell_box, lattice_constant, lattice='fcc', species='Ar',
+                     vacancies=0.0, substitutions=None, velocity=False,
+                     path=''):
+    # Writes cell_box unit cells of the lattice (sc, bcc, fcc, diamond, or
+    # hcp) with species a label or one label per basis site. Random
+    # fractions of the sites are left vacant or substituted (a dict of
+    # label: fraction) using np.random. The label indices are numbered by
+    # first appearance. Returns the number of particles written.
+    file_name = _check_if_path(path)
+    cell_box = _check_cell_box(cell_box)
+    if lattice not in _lattice_bases:
+        raise ValueError(f"Unknown lattice {lattice!r}, must be one of "
+                         f"{sorted(_lattice_bases)}.")
+    basis, cell = _lattice_bases[lattice]
+    lengths = lattice_constant * np.asarray(cell, dtype=np.float64)
+    basis = np.asarray(basis, dtype=np.float64) * lengths
+
+    # Unit cells ordered with the z index varying fastest, each with all of
+    # its basis sites.
+    cells = np.indices(cell_box, dtype=np.float64).reshape(3, -1).T
+    positions = (basis[np.newaxis, :, :]
+                 + lengths * cells[:, np.newaxis, :]).reshape(-1, 3)
+    labels = _lattice_labels(species, len(basis), len(cells))
+    if vacancies or substitutions:
+        keep, labels = _modify_sites(labels, vacancies, substitutions or {})
+        positions = positions[keep]
+    names, first, label_index = np.unique(labels, return_index=True,
+                                          return_inverse=True)
+    if len(names) == 1:
+        label, label_index = names[0], 1
+    else:
+        # Number the labels by first appearance, not alphabetically.
+        rank = np.empty(len(names), dtype=np.int64)
+        rank[np.argsort(first)] = np.arange(1, len(names) + 1)
+        label, label_index = labels, rank[label_index]
 
-                _write_molecule(out_file, atom_counter, xi, yj, zk,
-                                velocity=velocity)
-                atom_counter += 1
+    n_particles = len(positions)
+    with open(file_name, 'w') as out_file:
+        _write_box(out_file, lengths * np.asarray(cell_box))
+        _write_n_particles(out_file, n_particles)
+        _write_molecules(out_file, *positions.T, label=label,
+                         label_index=label_index, velocity=velocity)
     return n_particles
+
+
+def generate_fcc(cell_box, lattice_constant, velocity=False, path=''):
+    return generate_lattice(cell_box, lattice_constant, lattice='fcc',
+                            velocity=velocity, path=path)
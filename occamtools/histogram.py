@@ -1,6 +1,9 @@
 import warnings
+from collections.abc import Iterator
 import numpy as np
 from occamtools.occam_data import OccamData
+from occamtools.read_xyz import Xyz
+from occamtools.chunked_array import ChunkedArray
 
 
 def _check_dimension(dimension):
@@ -45,7 +48,87 @@ def _check_time_steps(data, time_steps):
     raise ValueError(error_str)
 
 
+def _check_fixed_bins(**kwargs):
+    bins = kwargs.get('bins', 10)
+    if np.ndim(bins) == 0 and kwargs.get('range', None) is None:
+        error_str = ('When input to histogram is an iterator of frames, the '
+                     'range keyword or explicit bin edges must be given so '
+                     'that all frames are binned identically.')
+        raise ValueError(error_str)
+
+
+def _has_fixed_bins(**kwargs):
+    # Whether the bins are the same for every frame, i.e. do not depend on
+    # the data, so that all frames can be binned together.
+    bins = kwargs.get('bins', 10)
+    if set(kwargs) - {'bins', 'range'} or isinstance(bins, str):
+        return False
+    return np.ndim(bins) == 1 or kwargs.get('range', None) is not None
+
+
+def _histogram_frames(d, first, last, max_values=2**24, **kwargs):
+    # Histogram of frames first to last (exclusive) of d in one call to
+    # np.histogram, or per chunk of frames of at most about max_values
+    # values. Equal to the sum of the histograms of the frames, as the bins
+    # are fixed.
+    chunk = max(max_values // max(int(np.prod(d.shape[1:])), 1), 1)
+    hist = None
+    for start in range(first, last, chunk):
+        hist_, bins = np.histogram(d[start:min(start + chunk, last)],
+                                   **kwargs)
+        hist = hist_ if hist is None else hist + hist_
+    return hist, bins
+
+
+def _check_time_steps_iterator(time_steps):
+    if time_steps is None:
+        return (0, None)
+    if (isinstance(time_steps, tuple) or isinstance(time_steps, list) or
+            isinstance(time_steps, np.ndarray)):
+        if (len(time_steps) == 2 and time_steps[0] >= 0 and
+                time_steps[1] >= time_steps[0]):
+            # Match the array version, where time_steps=(t, t) selects
+            # frame t.
+            return (time_steps[0], max(time_steps[1], time_steps[0] + 1))
+    error_str = (f'When input to histogram is an iterator of frames, '
+                 f'time_steps must be a list/tuple/np.ndarray of two '
+                 f'non-negative elements, with time_steps[1] >= '
+                 f'time_steps[0], not {time_steps}.')
+    raise ValueError(error_str)
+
+
+def _histogram_iterator(frames, dimension=None, time_steps=None, **kwargs):
+    # Accumulate the histogram over a stream of Xyz/OccamData chunks (or
+    # arrays of shape (n_frames, n_particles)), keeping only one chunk in
+    # memory at a time.
+    _check_fixed_bins(**kwargs)
+    dim = _check_dimension(dimension)
+    start, end = _check_time_steps_iterator(time_steps)
+    hist, bins = None, None
+    step = 0
+    for frame in frames:
+        if isinstance(frame, np.ndarray):
+            d = np.atleast_2d(frame)
+        else:
+            d = (frame.x, frame.y, frame.z)[dim]
+        first = max(start - step, 0)
+        last = len(d) if end is None else min(end - step, len(d))
+        step += len(d)
+        if first < last:
+            hist_, bins = np.histogram(d[first:last, :], **kwargs)
+            hist = hist_ if hist is None else hist + hist_
+        if end is not None and step >= end:
+            break
+    if hist is None:
+        raise ValueError(f'No frames found in the selected time_steps, '
+                         f'{time_steps}.')
+    return hist, bins
+
+
 def histogram(data, dimension=None, time_steps=None, **kwargs):
+    if isinstance(data, Iterator):
+        return _histogram_iterator(data, dimension=dimension,
+                                   time_steps=time_steps, **kwargs)
     if isinstance(data, OccamData):
         dim = _check_dimension(dimension)
         if dim == 0:
@@ -62,13 +145,182 @@ def histogram(data, dimension=None, time_steps=None, **kwargs):
                         f'ignored.')
             warnings.warn(warn_str)
     else:
-        error_str = (f'Given data must be of type OccamData or np.ndarray, not'
-                     f' {type(data)}.')
+        error_str = (f'Given data must be of type OccamData, np.ndarray, or '
+                     f'an iterator of frames, not {type(data)}.')
         raise TypeError(error_str)
 
     time_steps = _check_time_steps(d, time_steps)
+    if _has_fixed_bins(**kwargs) and time_steps[0] < len(d):
+        # time_steps=(t, t) selects frame t, as below.
+        return _histogram_frames(d, time_steps[0],
+                                 max(time_steps[1], time_steps[0] + 1),
+                                 **kwargs)
     hist, bins = np.histogram(d[time_steps[0], :], **kwargs)
     for step in range(time_steps[0]+1, time_steps[1]):
         hist_, _ = np.histogram(d[step, :], **kwargs)
         hist = hist + hist_
     return hist, bins
+
+
+class HistogramAccumulator:
+    # Running histogram with fixed bins (bins and range as in np.histogram,
+    # but not depending on the data), updated with frames from any source
+    # one chunk at a time. Accumulators over different parts of the data,
+    # e.g. from worker processes, can be merged. hist and bins are equal to
+    # those of histogram over all the frames.
+    def __init__(self, bins=10, range=None):
+        if not _has_fixed_bins(bins=bins, range=range):
+            error_str = ('HistogramAccumulator needs fixed bins, i.e. the '
+                         'range keyword or explicit bin edges.')
+            raise ValueError(error_str)
+        self.hist_kwargs = {'bins': bins, 'range': range}
+        self.hist, self.bins = np.histogram([], **self.hist_kwargs)
+        self.n_frames = 0
+
+    def update(self, frames, dimension=None):
+        # frames is an array of one frame or of shape (n_frames,
+        # n_particles) (e.g. memory-mapped or a ChunkedArray), an
+        # Xyz/OccamData object (using the dimension x/y/z), or an iterator
+        # of any of these. Large arrays are binned a chunk at a time.
+        if isinstance(frames, Iterator):
+            for f in frames:
+                self.update(f, dimension=dimension)
+            return self
+        if isinstance(frames, (OccamData, Xyz)):
+            d = (frames.x, frames.y, frames.z)[_check_dimension(dimension)]
+        elif isinstance(frames, (np.ndarray, ChunkedArray)):
+            d = frames if frames.ndim > 1 else np.asarray(frames)[None]
+        else:
+            error_str = (f'Frames must be of type OccamData, Xyz, '
+                         f'np.ndarray, ChunkedArray, or an iterator of '
+                         f'these, not {type(frames)}.')
+            raise TypeError(error_str)
+        if len(d) > 0:
+            hist, _ = _histogram_frames(d, 0, len(d), **self.hist_kwargs)
+            self.hist = self.hist + hist
+            self.n_frames += len(d)
+        return self
+
+    def merge(self, *others):
+        for other in others:
+            if not np.array_equal(self.bins, other.bins):
+                raise ValueError('Can not merge histograms with different '
+                                 'bins.')
+            self.hist = self.hist + other.hist
+            self.n_frames += other.n_frames
+        return self
+
+    def result(self):
+        return self.hist.copy(), self.bins.copy()
+
+
+def _check_dimensions(dimensions):
+    if isinstance(dimensions, str):
+        dims = [_check_dimension(d) for d in dimensions]
+    elif isinstance(dimensions, int):
+        dims = [_check_dimension(dimensions)]
+    else:
+        dims = [_check_dimension(d) for d in dimensions]
+    if not dims or len(set(dims)) != len(dims):
+        error_str = (f'Dimensions must be one or more of x/y/z (or 0/1/2), '
+                     f'each at most once, not {dimensions}.')
+        raise ValueError(error_str)
+    return dims
+
+
+def _frame_chunks(data, time_steps, max_values):
+    # Yields (frames, selection) of the selected time steps, in chunks of at
+    # most about max_values positions (or the chunks of an iterator).
+    if isinstance(data, Iterator):
+        start, end = _check_time_steps_iterator(time_steps)
+        step = 0
+        for frames in data:
+            first = max(start - step, 0)
+            last = len(frames.x) if end is None else min(end - step,
+                                                         len(frames.x))
+            step += len(frames.x)
+            if first < last:
+                yield frames, slice(first, last)
+            if end is not None and step >= end:
+                break
+    else:
+        t0, t1 = _check_time_steps(data.x, time_steps)
+        if t0 < len(data.x):
+            # time_steps=(t, t) selects frame t, as in histogram.
+            t1 = max(t1, t0 + 1)
+        chunk = max(max_values // max(data.x.shape[1], 1), 1)
+        for start in range(t0, t1, chunk):
+            yield data, slice(start, min(start + chunk, t1))
+
+
+def density_histogram(data, dimensions='xyz', bins=10, range=None,
+                      time_steps=None, by_type=True, density=True,
+                      max_values=2**24):
+    # Histogram of the particle positions along one or more of x, y, and z
+    # (e.g. dimensions='z' for a profile, or 'xyz' for a 3-D map), with bins
+    # and range as in np.histogramdd. The range defaults to the box. Unless
+    # by_type is False, the first axis is the particle type, so that
+    # hist[data.type_dict[name]] is the histogram of one type. With
+    # density, counts are divided by the number of frames and the bin
+    # volumes (with the box lengths along dimensions not binned), giving
+    # number densities. Frames are binned in chunks of at most about
+    # max_values positions, and data can also be an iterator of frames
+    # (e.g. OccamData.iter_frames).
+    dims = _check_dimensions(dimensions)
+    if not isinstance(data, (OccamData, Xyz, Iterator)):
+        error_str = (f'Given data must be of type OccamData, Xyz, or an '
+                     f'iterator of frames, not {type(data)}.')
+        raise TypeError(error_str)
+    if np.ndim(bins) == 0:
+        bins = [bins] * len(dims)
+    if len(bins) != len(dims):
+        error_str = (f'bins must be an int, or one int or array of bin edges '
+                     f'per dimension ({len(dims)}), not {bins}.')
+        raise ValueError(error_str)
+
+    hist, n_frames = None, 0
+    for frames, selection in _frame_chunks(data, time_steps, max_values):
+        if hist is None:
+            box = [None if b is None else float(b) for b in frames.box]
+            if range is None:
+                range = [(0.0, box[d]) for d in dims]
+            for d, b, r in zip(dims, bins, range):
+                if np.ndim(b) == 0 and r[1] is None:
+                    error_str = (f'The box is unknown, so range must be '
+                                 f'given for dimension {"xyz"[d]}.')
+                    raise ValueError(error_str)
+            all_bins, all_range = list(bins), list(range)
+            if by_type:
+                n_types = int(max(frames.type_dict.values())) + 1
+                all_bins.append(np.arange(n_types + 1) - 0.5)
+                all_range.append(None)
+        sample = [np.asarray((frames.x, frames.y, frames.z)[d][selection])
+                  for d in dims]
+        n_frames += len(sample[0])
+        if by_type:
+            sample.append(np.broadcast_to(frames.type, sample[0].shape))
+        hist_, edges = np.histogramdd(tuple(s.ravel() for s in sample),
+                                      bins=all_bins, range=all_range)
+        hist = hist_ if hist is None else hist + hist_
+    if hist is None:
+        raise ValueError(f'No frames found in the selected time_steps, '
+                         f'{time_steps}.')
+
+    if by_type:
+        hist = np.moveaxis(hist, -1, 0)
+        edges = edges[:-1]
+    if not density:
+        return hist.astype(np.int64), list(edges)
+
+    volume = np.ones([len(e) - 1 for e in edges])
+    for i, e in enumerate(edges):
+        shape = [1] * len(edges)
+        shape[i] = len(e) - 1
+        volume = volume * np.diff(e).reshape(shape)
+    for d in set((0, 1, 2)) - set(dims):
+        if box[d] is None:
+            error_str = (f'The box is unknown, so the number density can not '
+                         f'be computed without binning along {"xyz"[d]}.')
+            raise ValueError(error_str)
+        volume = volume * box[d]
+    return hist / (n_frames * volume), list(edges)
@@ -0,0 +1,63 @@
+import numpy as np
+from occamtools.histogram import _check_dimensions
+from occamtools.rdf import _check_data, _type_indices
+from occamtools.correlation import (_correlation_sum, _n_origins,
+                                    _particle_chunks)
+
+
+def _unwrap(positions, box_length):
+    # Undo jumps across the periodic boundary between consecutive frames,
+    # assuming no particle moves more than half the box length between them.
+    steps = np.diff(positions, axis=0)
+    steps -= box_length * np.rint(steps / box_length)
+    unwrapped = np.empty_like(positions)
+    unwrapped[0] = positions[0]
+    np.cumsum(steps, axis=0, out=unwrapped[1:])
+    unwrapped[1:] += positions[0]
+    return unwrapped
+
+
+def _msd_fft(positions):
+    # Mean squared displacement over all time origins of each column of
+    # positions (a list of arrays of shape (n_frames, n_particles), one per
+    # dimension) as a function of the lag, computed in O(T log T) with
+    # MSD(m) = S1(m) - 2 S2(m), with S2 the position autocorrelation (via
+    # FFT) and S1 from cumulative sums of the squared positions.
+    n = len(positions[0])
+    squared = sum(p * p for p in positions)
+    s2 = sum(_correlation_sum(p) for p in positions)
+    head = np.cumsum(squared, axis=0)
+    tail = np.cumsum(squared[::-1], axis=0)
+    s1 = 2 * head[-1] - np.concatenate((np.zeros((1,) + head.shape[1:]),
+                                        (head + tail)[:-1]))
+    return (s1 - 2 * s2) / _n_origins(n, s2.ndim, 0)
+
+
+def msd(data, type_name=None, dimensions='xyz', unwrap=True,
+        max_values=2**22):
+    # Mean squared displacement of the particles of type_name (a name in
+    # data.type_dict, all particles if None) along dimensions (e.g. 'z', or
+    # 'xy'), averaged over particles and all time origins. The positions are
+    # unwrapped across the periodic boundaries of the box unless unwrap is
+    # False. Particles are processed in chunks of at most about max_values
+    # positions per dimension. msd[m] is the mean for a lag of m frames,
+    # for m from 0 to n_frames - 1.
+    _check_data(data)
+    dims = _check_dimensions(dimensions)
+    if unwrap and (data.box is None or data.box[0] is None):
+        error_str = ('The box is unknown, so the positions can not be '
+                     'unwrapped. Use unwrap=False for unwrapped positions.')
+        raise ValueError(error_str)
+    ids = _type_indices(data, type_name)
+    n_frames = len(data.x)
+    if n_frames == 0 or len(ids) == 0:
+        raise ValueError(f'No positions found for type {type_name!r}.')
+
+    total = np.zeros(n_frames)
+    keys = ['xyz'[d] for d in dims]
+    for positions in _particle_chunks(data, ids, keys, max_values):
+        if unwrap:
+            positions = [_unwrap(p, float(data.box[d]))
+                         for p, d in zip(positions, dims)]
+        total += _msd_fft(positions).sum(axis=1)
+    return total / len(ids)
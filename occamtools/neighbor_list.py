@@ -0,0 +1,189 @@
+import itertools as it
+import numpy as np
+
+
+def wrap(positions, box):
+    # Positions moved into the periodic box [0, box) along each axis.
+    box = np.asarray(box, dtype=np.float64)
+    wrapped = np.mod(positions, box)
+    # np.mod rounds tiny negative values up to exactly the box length.
+    return np.where(wrapped >= box, wrapped - box, wrapped)
+
+
+def minimum_image(displacement, box):
+    # Displacement vectors (..., 3) replaced by their shortest periodic
+    # image.
+    box = np.asarray(box, dtype=np.float64)
+    return displacement - box * np.rint(displacement / box)
+
+
+def _check_cutoff(box, cutoff):
+    box = np.asarray(box, dtype=np.float64)
+    if box.shape != (3,) or not np.all(box > 0):
+        raise ValueError(f'box must be three positive lengths, not {box}.')
+    if not 0 < cutoff <= box.min() / 2:
+        error_str = (f'The cutoff must be positive and at most half the '
+                     f'shortest box length, {box.min() / 2}, not {cutoff}.')
+        raise ValueError(error_str)
+    return box
+
+
+def flat_cell_index(cell, n_cells):
+    # Flat (row-major) index of cells (n, 3) in a grid of n_cells cells.
+    return (cell[:, 0] * n_cells[1] + cell[:, 1]) * n_cells[2] + cell[:, 2]
+
+
+def cell_index(pos, box, n_cells):
+    # Cell of each position, clipped since positions wrapped into the box may
+    # round to exactly the box length.
+    cell = np.floor(pos * (n_cells / box)).astype(np.int64)
+    return np.clip(cell, 0, n_cells - 1)
+
+
+class CellList:
+    # Positions (n, 3) binned into a grid of cells of at least cell_size
+    # (and holding about one particle on average in dilute systems), sorted
+    # by cell so that the particles of each cell are contiguous.
+    def __init__(self, positions, box, cell_size):
+        self.box = np.asarray(box, dtype=np.float64)
+        positions = wrap(np.asarray(positions, dtype=np.float64), self.box)
+        volume = float(np.prod(self.box))
+        size = max(cell_size, (volume / max(len(positions), 1))**(1 / 3))
+        self.n_cells = np.maximum((self.box / size).astype(np.int64), 1)
+        cell = flat_cell_index(
+            cell_index(positions, self.box, self.n_cells), self.n_cells
+        )
+        self.order = np.argsort(cell, kind='stable')
+        self.positions = positions[self.order].T.copy()
+        self.counts = np.bincount(cell,
+                                  minlength=int(np.prod(self.n_cells)))
+        self.starts = np.cumsum(self.counts) - self.counts
+
+    def neighbour_shifts(self):
+        # Shifts to the neighbouring cells (and the cell itself). With fewer
+        # than three cells along an axis, the neighbouring cells repeat, and
+        # each is visited once.
+        return it.product(*[np.unique(np.mod([-1, 0, 1], n))
+                            for n in self.n_cells])
+
+
+def cell_pairs(a, b=None, box=None, cutoff=None, max_pairs=2**16):
+    # Yields (i, j, r) for pairs of a position a[i] and b[j] closer than
+    # cutoff (minimum image distance r), in batches of about max_pairs
+    # candidate pairs, in O(n) using cell lists. With b=None, the pairs
+    # within a are yielded once each, with i < j. The cutoff can be at most
+    # half the shortest box length.
+    box = _check_cutoff(box, cutoff)
+    same = b is None
+    a = np.asarray(a, dtype=np.float64)
+    cells = CellList(a if same else b, box, cutoff)
+    n_cells = cells.n_cells
+    if same:
+        order_a = cells.order
+        a = cells.positions
+    else:
+        a = wrap(a, box)
+        order_a = np.argsort(flat_cell_index(cell_index(a, box, n_cells),
+                                             n_cells), kind='stable')
+        a = a[order_a].T.copy()
+    cell_a = cell_index(a.T, box, n_cells)
+    b = cells.positions
+    half = box / 2
+    cutoff2 = cutoff * cutoff
+
+    for shift in cells.neighbour_shifts():
+        neighbour = flat_cell_index(np.mod(cell_a + shift, n_cells), n_cells)
+        n_pairs = cells.counts[neighbour]
+        total = int(n_pairs.sum())
+        if total == 0:
+            continue
+        batch = max(max_pairs * len(n_pairs) // total, 1)
+        for lo in range(0, len(n_pairs), batch):
+            n = n_pairs[lo:lo + batch]
+            i = np.repeat(np.arange(lo, lo + len(n)), n)
+            j = (np.repeat(cells.starts[neighbour[lo:lo + batch]]
+                           - np.cumsum(n) + n, n) + np.arange(int(n.sum())))
+            if same:
+                keep = i < j
+                i, j = i[keep], j[keep]
+            r2 = np.zeros(len(i))
+            for k in range(3):
+                d = b[k][j] - a[k][i]
+                # Minimum image, both positions being inside the box.
+                d[d > half[k]] -= box[k]
+                d[d < -half[k]] += box[k]
+                r2 += d * d
+            keep = r2 < cutoff2
+            i, j = order_a[i[keep]], cells.order[j[keep]]
+            if same:
+                i, j = np.minimum(i, j), np.maximum(i, j)
+            yield i, j, np.sqrt(r2[keep])
+
+
+def neighbor_pairs(a, b=None, box=None, cutoff=None):
+    # All pairs of cell_pairs, as arrays i, j, and r.
+    batches = list(cell_pairs(a, b, box=box, cutoff=cutoff))
+    if not batches:
+        return (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                np.zeros(0))
+    return tuple(np.concatenate(x) for x in zip(*batches))
+
+
+class VerletList:
+    # Pairs of particles closer than cutoff + skin, reused for later frames
+    # until some particle has moved more than half the skin since the list
+    # was built, after which no pair outside the list can be closer than
+    # cutoff.
+    def __init__(self, box, cutoff, skin):
+        if not skin >= 0:
+            raise ValueError(f'skin must be non-negative, not {skin}.')
+        self.box = _check_cutoff(box, cutoff + skin)
+        self.cutoff = cutoff
+        self.skin = skin
+        self.reference = None
+        self.i, self.j = None, None
+        self.n_builds = 0
+
+    @classmethod
+    def from_fort1(cls, fort1, box=None):
+        # Cutoffs from a Fort1 (or OccamData) object, with the skin being the
+        # difference of the neighbour list cutoff nl_cutoff and cutoff.
+        if box is None:
+            box = getattr(fort1, 'box', None)
+        if box is None or box[0] is None:
+            raise ValueError('The box is unknown, so it must be given.')
+        return cls(box, fort1.cutoff, fort1.nl_cutoff - fort1.cutoff)
+
+    def build(self, positions):
+        positions = np.asarray(positions, dtype=np.float64)
+        i, j, _ = neighbor_pairs(positions, box=self.box,
+                                 cutoff=self.cutoff + self.skin)
+        # The pairs come ordered by cell, sort them for a stable result.
+        order = np.lexsort((j, i))
+        self.i, self.j = i[order], j[order]
+        self.reference = positions.copy()
+        self.n_builds += 1
+
+    def update(self, positions):
+        # Rebuild the list if needed for positions, returning whether it
+        # was rebuilt.
+        positions = np.asarray(positions, dtype=np.float64)
+        if (self.reference is None
+                or self.reference.shape != positions.shape):
+            self.build(positions)
+            return True
+        moved = minimum_image(positions - self.reference, self.box)
+        if np.max(np.einsum('ij,ij->i', moved, moved),
+                  initial=0.0) > (self.skin / 2)**2:
+            self.build(positions)
+            return True
+        return False
+
+    def pairs(self, positions):
+        # Arrays i, j (i < j), and r of the pairs closer than cutoff.
+        self.update(positions)
+        positions = np.asarray(positions, dtype=np.float64)
+        d = minimum_image(positions[self.j] - positions[self.i], self.box)
+        r = np.sqrt(np.einsum('ij,ij->i', d, d))
+        keep = r < self.cutoff
+        return self.i[keep], self.j[keep], r[keep]
@@ -1,15 +1,20 @@
 import os
+import io
+import mmap
+import shutil
+import hashlib
 import numpy as np
 import warnings
 import json
 from tqdm import tqdm
-from occamtools.read_xyz import _are_floats, Xyz
+from occamtools.read_xyz import _are_floats, _type_dtype, Xyz
 from occamtools.read_fort1 import Fort1
 from occamtools.read_fort7 import Fort7
+from occamtools.chunked_array import ChunkedArray
 
 
 def _check_internal_consistency(a, b):
-    ignore = ['file_name', 'num_lines']
+    ignore = ['file_name', 'num_lines', 'bytes_read']
     a_vars, b_vars = a.__dict__, b.__dict__
     consistent = True
     for k in a_vars:
@@ -45,11 +50,12 @@ def _check_internal_consistency_all(fort1, fort7, xyz):
         return False
 
 
-def _open_fort_files(fort1, fort7, xyz, silent, which=None):
+def _open_fort_files(fort1, fort7, xyz, silent, which=None, dtype=None,
+                     read_xyz=True):
     if which is None:
         f1 = Fort1(fort1)
         f7 = Fort7(fort7)
-        x = Xyz(xyz)
+        x = Xyz(xyz, dtype=dtype)
     else:
         if which == 0:
             f1 = fort1
@@ -65,9 +71,9 @@ def _open_fort_files(fort1, fort7, xyz, silent, which=None):
             x = xyz
         f1 = Fort1(f1)
         f7 = Fort7(f7)
-        x = Xyz(x)
+        x = Xyz(x, dtype=dtype)
 
-    for f in (f1, f7, x):
+    for f in (f1, f7, x) if read_xyz else (f1, f7):
         f.read_file(silent=silent)
     return f1, f7, x
 
@@ -82,12 +88,13 @@ def _check_npy_dump_exists(file_name):
         raise FileNotFoundError('Could not find file, ' + file_name)
     exists = False
     if os.path.exists(class_dir):
-        if os.path.exists(os.path.join(class_dir, 'x.npy')):
+        if (os.path.exists(os.path.join(class_dir, 'x.npy')) or os.path.exists(
+                os.path.join(class_dir, 'x' + ChunkedArray.extension))):
             exists = True
     return exists, class_dir
 
 
-def _check_constructor_input(*args, silent=False):
+def _check_constructor_input(*args, silent=False, dtype=None, read_xyz=True):
     if len(args) == 3:
         fort1, fort7, xyz = args
         if (isinstance(fort1, Fort1) and isinstance(fort7, Fort7)
@@ -95,13 +102,17 @@ def _check_constructor_input(*args, silent=False):
             return fort1, fort7, xyz
         elif (isinstance(fort1, str) and isinstance(fort7, str)
                 and isinstance(xyz, str)):
-            return _open_fort_files(fort1, fort7, xyz, silent)
+            return _open_fort_files(fort1, fort7, xyz, silent,
+                                    dtype=dtype, read_xyz=read_xyz)
         elif isinstance(fort1, str):
-            return _open_fort_files(fort1, fort7, xyz, silent, which=0)
+            return _open_fort_files(fort1, fort7, xyz, silent, which=0,
+                                    dtype=dtype, read_xyz=read_xyz)
         elif isinstance(fort7, str):
-            return _open_fort_files(fort1, fort7, xyz, silent, which=1)
+            return _open_fort_files(fort1, fort7, xyz, silent, which=1,
+                                    dtype=dtype, read_xyz=read_xyz)
         elif isinstance(xyz, str):
-            return _open_fort_files(fort1, fort7, xyz, silent, which=2)
+            return _open_fort_files(fort1, fort7, xyz, silent, which=2,
+                                    dtype=dtype, read_xyz=read_xyz)
         else:
             raise ValueError('OccamData constructor input not recognized as '
                              'Fort1/Fort7/Xzy objects or (one or more) file '
@@ -131,37 +142,502 @@ def _check_constructor_input(*args, silent=False):
             f1 = os.path.join(args[0], 'fort.1')
             f7 = os.path.join(args[0], 'fort.7')
             x = os.path.join(args[0], 'fort.8')
-        return _open_fort_files(f1, f7, x, silent)
+        return _open_fort_files(f1, f7, x, silent, dtype=dtype,
+                                read_xyz=read_xyz)
+
+
+def _file_fingerprint(file_name, content_hash=False, block_size=2**16):
+    stat = os.stat(file_name)
+    fingerprint = {'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+                   'hash': None}
+    if content_hash:
+        # Hash a fixed number of evenly spaced blocks (always including the
+        # start and end of the file), so the cost does not grow with the
+        # file size.
+        h = hashlib.blake2b()
+        n_blocks = 18
+        with open(file_name, 'rb') as in_file:
+            starts = np.linspace(0, max(stat.st_size - block_size, 0),
+                                 n_blocks).astype(np.int64)
+            for start in np.unique(starts):
+                in_file.seek(int(start))
+                h.update(in_file.read(block_size))
+        fingerprint['hash'] = h.hexdigest()
+    return fingerprint
+
+
+def _fingerprint_changed(old, new):
+    if old['size'] != new['size']:
+        return True
+    if old['hash'] is not None and new['hash'] is not None:
+        return old['hash'] != new['hash']
+    return old['mtime'] != new['mtime']
+
+
+def _tail_hash(file_name, offset, block_size=2**16):
+    # Hash of the block of a file just before byte offset, used to check
+    # that a file was appended to rather than rewritten.
+    with open(file_name, 'rb') as in_file:
+        start = max(offset - block_size, 0)
+        in_file.seek(start)
+        return hashlib.blake2b(in_file.read(offset - start)).hexdigest()
+
+
+def _append_npy(file_name, array):
+    # Append rows to an .npy file in place, rewriting only its header. The
+    # header numpy writes leaves room for the first dimension to grow, if it
+    # does not the whole file is rewritten.
+    with open(file_name, 'r+b') as npy_file:
+        version = np.lib.format.read_magic(npy_file)
+        if version == (1, 0):
+            header = np.lib.format.read_array_header_1_0(npy_file)
+        else:
+            header = np.lib.format.read_array_header_2_0(npy_file)
+        shape, fortran_order, dtype = header
+        data_offset = npy_file.tell()
+
+        new_header = io.BytesIO()
+        header = {'descr': np.lib.format.dtype_to_descr(dtype),
+                  'fortran_order': False,
+                  'shape': (shape[0] + len(array),) + shape[1:]}
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(new_header, header)
+        else:
+            np.lib.format.write_array_header_2_0(new_header, header)
+        in_place = (not fortran_order and array.shape[1:] == shape[1:]
+                    and len(new_header.getvalue()) == data_offset)
+        if in_place:
+            # Write the data before the header, so an interrupted append
+            # leaves a valid file with the old shape.
+            npy_file.seek(0, os.SEEK_END)
+            npy_file.write(np.ascontiguousarray(array, dtype=dtype).tobytes())
+            npy_file.flush()
+            npy_file.seek(0)
+            npy_file.write(new_header.getvalue())
+    if not in_place:
+        old = np.load(file_name)
+        _save_npy(file_name, np.concatenate((old, array.astype(old.dtype))))
+
+
+def _is_mapped_from(array, file_name):
+    # Whether array is memory-mapped from file_name itself, as opposed to
+    # e.g. the result of astype on such an array, which is an np.memmap
+    # instance held in memory.
+    return (isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap)
+            and array.filename is not None and os.path.exists(file_name)
+            and os.path.samefile(array.filename, file_name))
+
+
+def _save_npy(file_name, array):
+    # Arrays memory-mapped from the target file itself are already stored.
+    # Anything else is written to a temporary file which then replaces the
+    # old one, so existing memory maps of the old file remain valid.
+    if _is_mapped_from(array, file_name) and array.mode in ('r', 'r+'):
+        if array.mode == 'r+':
+            array.flush()
+        return
+    tmp_file_name = file_name + '.tmp'
+    with open(tmp_file_name, 'wb') as out_file:
+        np.save(out_file, array)
+    os.replace(tmp_file_name, file_name)
+
+
+def _convert_npy(file_name, dtype, max_values=2**22):
+    # Rewrite an .npy file with another dtype, a block of rows at a time, so
+    # the array is never read into memory as a whole.
+    old = np.load(file_name, mmap_mode='r')
+    tmp_file_name = file_name + '.tmp'
+    new = np.lib.format.open_memmap(tmp_file_name, mode='w+', dtype=dtype,
+                                    shape=old.shape)
+    rows = max(max_values // max(int(np.prod(old.shape[1:])), 1), 1)
+    for start in range(0, len(old), rows):
+        new[start:start + rows] = old[start:start + rows]
+    new.flush()
+    del old, new
+    os.replace(tmp_file_name, file_name)
+
+
+def _convert_chunked(array, dtype):
+    # ChunkedArray rewritten with another dtype, one row of chunks at a time.
+    rows = array.chunks[0]
+    tmp_path = array.path + '.convert'
+    new = ChunkedArray.create(tmp_path, array[:rows].astype(dtype),
+                              chunks=array.chunks, level=array.level,
+                              precision=array.precision)
+    for start in range(rows, len(array), rows):
+        new.append(array[start:start + rows])
+    shutil.rmtree(array.path)
+    os.rename(tmp_path, array.path)
+    return ChunkedArray(array.path)
+
+
+def _is_array(value):
+    return isinstance(value, (np.ndarray, ChunkedArray))
+
+
+def _save_chunked(path, array, precision=None):
+    # Arrays read from the target directory itself are already stored.
+    if (isinstance(array, ChunkedArray) and os.path.exists(path)
+            and os.path.samefile(array.path, path)
+            and array.precision == precision):
+        return
+    ChunkedArray.create(path, array, precision=precision)
+
+
+def _stream_xyz(xyz, class_path, chunk, silent=False, chunked=False,
+                precision=None):
+    # Read the trajectory of xyz chunk frames at a time with Xyz.iter_frames,
+    # appending the frames to .npy files (or chunked arrays) in class_path,
+    # which are then loaded into xyz as if read with read_file. Returns
+    # False, writing nothing, if the file holds no complete frame.
+    if not silent:
+        print('Streaming fort.8 data from file:\n'
+              + os.path.abspath(xyz.file_name))
+    arrays = {}
+    n_frames = 0
+    for subset in xyz.iter_frames(chunk=chunk):
+        if n_frames == 0:
+            os.mkdir(class_path)
+        for key in subset._trajectory_arrays():
+            values = getattr(subset, key)
+            if chunked and key in arrays:
+                arrays[key].append(values)
+            elif chunked:
+                arrays[key] = ChunkedArray.create(
+                    os.path.join(class_path, key + ChunkedArray.extension),
+                    values,
+                    precision=precision if key in ('x', 'y', 'z') else None
+                )
+            else:
+                npy_file = os.path.join(class_path, key + '.npy')
+                if n_frames == 0:
+                    _save_npy(npy_file, values)
+                else:
+                    _append_npy(npy_file, values)
+        n_frames += len(subset.time)
+        header = subset
+    if n_frames == 0:
+        return False
+    for key in ('n_particles', 'velocities', 'type', 'type_dict', 'box',
+                'comment_format_known'):
+        setattr(xyz, key, getattr(header, key))
+    xyz.n_time_steps_ = n_frames
+    for key in header._trajectory_arrays():
+        if chunked:
+            setattr(xyz, key, arrays[key])
+        else:
+            setattr(xyz, key, np.load(os.path.join(class_path, key + '.npy'),
+                                      mmap_mode='r'))
+    return True
 
 
 class OccamData:
     save_dir = 'class_data'
 
+    sources = ('fort1', 'fort7', 'xyz')
+
+    storage_types = ('npy', 'chunked')
+
     def __init__(self, *args, load_from_npy=True, save_to_npy=True,
-                 silent=False):
+                 silent=False, dtype=None, mmap_mode='r', content_hash=False,
+                 storage=None, precision=None, stream_chunk=None):
+        # Arrays loaded from the .npy files are memory-mapped with the given
+        # mmap_mode (see np.load), so only the parts of the arrays actually
+        # used are read from disk. Use mmap_mode=None to read them into
+        # memory.
+        #
+        # With storage='chunked' the arrays are instead saved as compressed
+        # chunks (see ChunkedArray), and slicing the loaded arrays reads only
+        # the chunks needed. A precision rounds the stored x, y, and z
+        # coordinates to multiples of it, for several times smaller files.
+        #
+        # With stream_chunk, a new cache is built by reading fort.8 (from a
+        # file path) stream_chunk frames at a time with Xyz.iter_frames and
+        # appending them to the cached arrays, so the trajectory never has to
+        # fit in memory. This needs save_to_npy, and an existing class_data
+        # directory which is not loaded is left as is, with fort.8 then read
+        # in full.
+        if storage is not None and storage not in self.storage_types:
+            raise ValueError(f'storage must be one of {self.storage_types}, '
+                             f'not {storage!r}')
         npy_loaded = False
+        class_path = None
         if len(args) == 1 and load_from_npy:
             check, class_path = _check_npy_dump_exists(args[0])
             if check:
-                self.load(class_path, silent=silent)
+                self.load(class_path, silent=silent, mmap_mode=mmap_mode)
                 npy_loaded = True
+                changed = self._changed_sources(class_path, content_hash)
+                if changed:
+                    rewritten = self._update_sources(
+                        class_path, changed, silent, content_hash,
+                        append_to_npy=save_to_npy
+                    )
+                    if save_to_npy and rewritten:
+                        self.save(overwrite=True, mmap_mode=mmap_mode)
+                    elif save_to_npy:
+                        self._save_class()
+                if save_to_npy and storage is not None and (
+                        storage != getattr(self, 'storage', 'npy')
+                        or precision != getattr(self, 'precision', None)):
+                    self.storage = storage
+                    self.precision = precision
+                    self.save(overwrite=True, mmap_mode=mmap_mode)
         if not npy_loaded:
-            fort1, fort7, xyz = _check_constructor_input(*args, silent=silent)
+            class_path = None
+            stream = stream_chunk is not None and save_to_npy
+            fort1, fort7, xyz = _check_constructor_input(
+                *args, silent=silent, dtype=dtype, read_xyz=not stream
+            )
+            streamed = False
+            if stream and not hasattr(xyz, 'x'):
+                save_path = os.path.join(os.path.dirname(fort1.file_name),
+                                         self.save_dir)
+                # An existing cache is not overwritten, as with save.
+                if not os.path.exists(save_path):
+                    streamed = _stream_xyz(
+                        xyz, save_path, stream_chunk, silent,
+                        chunked=storage == 'chunked', precision=precision
+                    )
+                if not streamed:
+                    xyz.read_file(silent=silent)
             self.consistent = _check_internal_consistency_all(fort1, fort7,
                                                               xyz)
-            ignore = ['file_name', 'n_time_steps_', 'file_contents',
-                      'comment_format_known', 'num_lines']
             for f in (fort1, fort7, xyz):
-                for key in f.__dict__:
-                    if key not in ignore:
-                        setattr(self, key, f.__dict__[key])
+                self._copy_attributes(f)
             self.fort1_file_name = fort1.file_name
             self.fort7_file_name = fort7.file_name
             self.xyz_file_name = xyz.file_name
-            if save_to_npy:
-                self.save()
+            self._record_fingerprints(content_hash)
+            self.ingested = {}
+            for source, f in (('fort7', fort7), ('xyz', xyz)):
+                self._record_ingested(source, f)
+            self.storage = 'npy' if storage is None else storage
+            self.precision = precision
+            if save_to_npy and self.save(overwrite=streamed,
+                                         mmap_mode=mmap_mode):
+                class_path = self.save_path
+        if (dtype is not None
+                and np.dtype(dtype).name != getattr(self, 'dtype', None)):
+            if save_to_npy and class_path is not None:
+                self._convert_dtype(dtype, class_path, mmap_mode)
+            elif npy_loaded:
+                # The cache keeps its dtype, which class.json describes.
+                stored_dtype = getattr(self, 'dtype', None)
+                self._convert_dtype(dtype)
+                self.dtype = stored_dtype
+            else:
+                self._convert_dtype(dtype)
+
+    def _copy_attributes(self, f):
+        ignore = ['file_name', 'n_time_steps_', 'file_contents',
+                  'comment_format_known', 'num_lines', 'index', 'bytes_read',
+                  'observables']
+        for key in f.__dict__:
+            if key not in ignore:
+                setattr(self, key, f.__dict__[key])
+
+    def _source_file_name(self, source, class_path=None):
+        file_name = getattr(self, source + '_file_name')
+        if class_path is not None:
+            # Locate the source files relative to the cache directory, as
+            # the stored paths may be relative to another working directory.
+            file_name = os.path.join(os.path.dirname(
+                os.path.abspath(class_path)), os.path.basename(file_name))
+        return file_name
+
+    def _record_fingerprints(self, content_hash=False, class_path=None):
+        self.source_fingerprints = {}
+        for source in self.sources:
+            file_name = self._source_file_name(source, class_path)
+            if os.path.exists(file_name):
+                self.source_fingerprints[source] = _file_fingerprint(
+                    file_name, content_hash=content_hash
+                )
+
+    def _changed_sources(self, class_path, content_hash=False):
+        # Source files which have changed since the cache was written. Caches
+        # written without fingerprints, and source files which have since
+        # been removed, are trusted as is.
+        changed = []
+        fingerprints = getattr(self, 'source_fingerprints', {})
+        for source in self.sources:
+            file_name = self._source_file_name(source, class_path)
+            if source in fingerprints and os.path.exists(file_name):
+                old = fingerprints[source]
+                new = _file_fingerprint(
+                    file_name,
+                    content_hash=content_hash and old['hash'] is not None
+                )
+                if _fingerprint_changed(old, new):
+                    changed.append(source)
+        return changed
+
+    def _record_ingested(self, source, f):
+        # Remember how far into fort.7/fort.8 the data has been read, so
+        # data appended later by a running simulation can be read on its own.
+        if getattr(f, 'bytes_read', None) is not None:
+            self.ingested[source] = {
+                'bytes': f.bytes_read,
+                'hash': _tail_hash(f.file_name, f.bytes_read)
+            }
+        elif source in self.ingested:
+            del self.ingested[source]
+
+    def _can_append(self, source, file_name):
+        ingested = getattr(self, 'ingested', {})
+        if source not in ingested or not os.path.exists(file_name):
+            return False
+        # Data saved by an older version lacks the names of the fort.7
+        # observables.
+        if source == 'fort7' and not hasattr(self, 'observable_names'):
+            return False
+        offset = ingested[source]['bytes']
+        return (os.path.getsize(file_name) >= offset
+                and _tail_hash(file_name, offset) == ingested[source]['hash'])
+
+    def _append_array(self, key, values, class_path=None):
+        # The values are stored with the dtype of the file they are appended
+        # to, and of the array in memory, which may differ if the data was
+        # converted to another dtype without saving it.
+        old = getattr(self, key)
+        if isinstance(old, ChunkedArray) and class_path is not None:
+            old.append(values)
+            return
+        if class_path is not None:
+            npy_file = os.path.join(class_path, key + '.npy')
+            if os.path.exists(npy_file):
+                mapped = _is_mapped_from(old, npy_file)
+                _append_npy(npy_file, values)
+                if mapped:
+                    setattr(self, key, np.load(npy_file, mmap_mode=old.mode))
+                    return
+        setattr(self, key, np.concatenate((old, values.astype(old.dtype))))
+
+    def _append_source(self, source, file_name, class_path=None):
+        # Read only the data appended to fort.7/fort.8 since it was last
+        # read, appending it to the arrays (and the .npy files in
+        # class_path). Returns False, changing nothing, if the appended fort.7
+        # blocks hold other observables than the ones already read.
+        offset = self.ingested[source]['bytes']
+        if source == 'fort7':
+            f = Fort7(file_name)
+            f.block_end = getattr(self, 'block_end', None)
+            n_appended = f.read_appended(offset)
+            keys = self.observable_names
+            if n_appended > 0 and f.observable_names != keys:
+                return False
+        else:
+            f = Xyz(file_name, dtype=getattr(self, 'dtype', None))
+            n_appended = f.read_appended(offset)
+            keys = ['time', 'x', 'y', 'z']
+            if self.velocities:
+                keys += ['vx', 'vy', 'vz']
+        if n_appended > 0:
+            for key in keys:
+                self._append_array(key, getattr(f, key), class_path)
+        if source == 'fort7' and f.final_averages:
+            # The run finished since it was last read.
+            self.final_step = f.final_step
+            self.final_averages = f.final_averages
+            for key, value in f.final_averages.items():
+                setattr(self, key, value)
+        self._record_ingested(source, f)
+        return True
+
+    def _update_sources(self, class_path, changed, silent=False,
+                        content_hash=False, append_to_npy=True):
+        # Read only the data appended to changed fort.7/fort.8 files if
+        # possible, otherwise re-read only the changed files. Returns True if
+        # any arrays were replaced rather than appended to.
+        rewritten = False
+        if class_path is not None:
+            for source in self.sources:
+                setattr(self, source + '_file_name',
+                        self._source_file_name(source, class_path))
+        npy_path = class_path if append_to_npy else None
+        for source in changed:
+            file_name = self._source_file_name(source)
+            if (self._can_append(source, file_name)
+                    and self._append_source(source, file_name, npy_path)):
+                continue
+            if not silent:
+                print('Source file changed since the .npy files were saved:\n'
+                      + os.path.abspath(file_name))
+            if source == 'fort1':
+                f = Fort1(file_name)
+            elif source == 'fort7':
+                f = Fort7(file_name)
+            else:
+                f = Xyz(file_name, dtype=getattr(self, 'dtype', None))
+            f.read_file(silent=silent)
+            if source == 'xyz' and not f.velocities:
+                for key in ('vx', 'vy', 'vz'):
+                    if hasattr(self, key):
+                        delattr(self, key)
+            self._copy_attributes(f)
+            if source != 'fort1':
+                if not hasattr(self, 'ingested'):
+                    self.ingested = {}
+                self._record_ingested(source, f)
+            rewritten = True
+        self._record_fingerprints(content_hash, class_path=class_path)
+        return rewritten
+
+    def refresh(self, silent=False, content_hash=False):
+        # Bring the data up to date with its source files, e.g. to follow a
+        # running simulation. Frames and step blocks appended to fort.8 and
+        # fort.7 are read on their own and appended to the arrays and the
+        # .npy files, so the cost depends only on the amount of new data.
+        class_path = os.path.join(os.path.dirname(self.fort1_file_name),
+                                  self.save_dir)
+        if not os.path.exists(os.path.join(class_path, 'class.json')):
+            class_path = None
+        changed = self._changed_sources(class_path, content_hash)
+        if not changed:
+            return False
+        rewritten = self._update_sources(class_path, changed, silent,
+                                         content_hash)
+        if class_path is not None and rewritten:
+            mmap_mode = None
+            if isinstance(self.x, np.memmap):
+                mmap_mode = self.x.mode
+            self.save(overwrite=True, mmap_mode=mmap_mode)
+        elif class_path is not None:
+            self._save_class()
+        return True
+
+    def _convert_dtype(self, dtype, class_path=None, mmap_mode='r'):
+        # Used when the data was loaded from Xyz objects or .npy files stored
+        # with a different dtype than requested. The arrays of a cache in
+        # class_path are rewritten with the new dtype, memory-mapped .npy
+        # files and chunked arrays a block at a time, so they are not read
+        # into memory, and the dtype saved in class.json keeps matching the
+        # files. Without class_path the arrays are converted in memory.
+        type_dtype = _type_dtype(self.type_dict)
+        for key in ('x', 'y', 'z', 'vx', 'vy', 'vz', 'type'):
+            if not hasattr(self, key):
+                continue
+            new_dtype = type_dtype if key == 'type' else dtype
+            value = getattr(self, key)
+            npy_file = None
+            if class_path is not None:
+                npy_file = os.path.join(class_path, key + '.npy')
+            if class_path is not None and isinstance(value, ChunkedArray):
+                setattr(self, key, _convert_chunked(value, new_dtype))
+            elif npy_file is not None and _is_mapped_from(value, npy_file):
+                del value
+                _convert_npy(npy_file, new_dtype)
+                setattr(self, key, np.load(npy_file, mmap_mode=mmap_mode))
+            else:
+                setattr(self, key, value.astype(new_dtype))
+                if npy_file is not None:
+                    _save_npy(npy_file, getattr(self, key))
+        self.dtype = np.dtype(dtype).name
+        if class_path is not None:
+            self._save_class()
 
-    def save(self, overwrite=False):
+    def save(self, overwrite=False, mmap_mode='r'):
         self.save_path = os.path.join(os.path.dirname(self.fort1_file_name),
                                       self.save_dir)
         if (os.path.exists(self.save_path)):
@@ -170,20 +646,39 @@ class OccamData:
         else:
             os.mkdir(self.save_path)
         self._save_arrays()
+        self._remove_stale_arrays()
         self._delete_array_attributes()
         self._save_class()
-        self._load_arrays(self.save_path, silent=True)
+        self._load_arrays(self.save_path, silent=True, mmap_mode=mmap_mode)
         return True
 
-    def load(self, class_path, silent=False):
-        self._load_arrays(class_path, silent=silent)
+    def load(self, class_path, silent=False, mmap_mode='r'):
+        self._load_arrays(class_path, silent=silent, mmap_mode=mmap_mode)
         self._load_class(class_path)
 
-    def _load_arrays(self, class_path, silent):
+    def iter_frames(self, chunk=1):
+        # Yields Xyz objects with views of at most chunk frames of the
+        # trajectory arrays.
+        if not (isinstance(chunk, int) and chunk >= 1):
+            raise ValueError(f'chunk must be a positive integer, not {chunk}')
+        n_frames = len(self.x)
+        for start in range(0, n_frames, chunk):
+            frames = slice(start, min(start + chunk, n_frames))
+            subset = Xyz(self.xyz_file_name,
+                         dtype=getattr(self, 'dtype', None))
+            for key in ('n_particles', 'velocities', 'type', 'type_dict',
+                        'box'):
+                setattr(subset, key, getattr(self, key))
+            subset.n_time_steps_ = frames.stop - frames.start
+            for key in subset._trajectory_arrays():
+                setattr(subset, key, getattr(self, key)[frames])
+            yield subset
+
+    def _load_arrays(self, class_path, silent, mmap_mode=None):
         files = os.listdir(class_path)
         non_npy_files = []
         for f in files:
-            if f.split('.')[-1] != 'npy':
+            if os.path.splitext(f)[1] not in ('.npy', ChunkedArray.extension):
                 non_npy_files.append(f)
         for f in non_npy_files:
             files.remove(f)
@@ -191,34 +686,56 @@ class OccamData:
         if not silent:
             print('Loading data from .npy files in directory:\n'
                   + os.path.abspath(class_path) + '/')
-            with tqdm(total=len(files)) as pbar:
-                for npy_file in files:
-                    attribute_name = os.path.basename(npy_file).split('.')[0]
-                    setattr(self, attribute_name, np.load(os.path.join(
-                        class_path, npy_file))
-                    )
-                    pbar.update(1)
-        else:
-            for npy_file in files:
-                attribute_name = os.path.basename(npy_file).split('.')[0]
-                setattr(self, attribute_name, np.load(os.path.join(class_path,
-                                                                   npy_file)))
+            files = tqdm(files)
+        for npy_file in files:
+            attribute_name, extension = os.path.splitext(npy_file)
+            if extension == ChunkedArray.extension:
+                setattr(self, attribute_name, ChunkedArray(
+                    os.path.join(class_path, npy_file)))
+                continue
+            setattr(self, attribute_name, np.load(os.path.join(
+                class_path, npy_file), mmap_mode=mmap_mode)
+            )
 
     def _save_arrays(self):
         self.save_path = os.path.join(os.path.dirname(self.fort1_file_name),
                                       self.save_dir)
-        attributes_to_delete = []
+        chunked = getattr(self, 'storage', 'npy') == 'chunked'
         for key in self.__dict__:
-            if isinstance(self.__dict__[key], np.ndarray):
+            value = self.__dict__[key]
+            if chunked and _is_array(value) and value.ndim > 0:
+                precision = None
+                if key in ('x', 'y', 'z'):
+                    precision = getattr(self, 'precision', None)
+                _save_chunked(os.path.join(
+                    self.save_path, key + ChunkedArray.extension
+                ), value, precision=precision)
+            elif _is_array(value):
                 npy_file_name = key + '.npy'
-                np.save(os.path.join(self.save_path, npy_file_name),
-                        self.__dict__[key])
-                attributes_to_delete.append(key)
+                _save_npy(os.path.join(self.save_path, npy_file_name),
+                          np.asanyarray(value))
+
+    def _remove_stale_arrays(self):
+        # Remove .npy files left over from attributes that no longer exist,
+        # e.g. velocities in a trajectory which was since rewritten without,
+        # or stored in the other storage format.
+        chunked = getattr(self, 'storage', 'npy') == 'chunked'
+        for npy_file in os.listdir(self.save_path):
+            key, extension = os.path.splitext(npy_file)
+            value = self.__dict__.get(key, None)
+            stored_chunked = (chunked and _is_array(value)
+                              and value.ndim > 0)
+            if extension == '.npy' and (not _is_array(value)
+                                        or stored_chunked):
+                os.remove(os.path.join(self.save_path, npy_file))
+            elif (extension == ChunkedArray.extension
+                    and not stored_chunked):
+                shutil.rmtree(os.path.join(self.save_path, npy_file))
 
     def _delete_array_attributes(self):
         attributes_to_delete = []
         for key in self.__dict__:
-            if isinstance(self.__dict__[key], np.ndarray):
+            if _is_array(self.__dict__[key]):
                 attributes_to_delete.append(key)
         for attribute in attributes_to_delete:
             delattr(self, attribute)
@@ -227,8 +744,10 @@ class OccamData:
         self.save_path = os.path.join(os.path.dirname(self.fort1_file_name),
                                       self.save_dir)
         json_file = os.path.join(self.save_path, 'class.json')
+        class_attributes = {key: value for key, value in self.__dict__.items()
+                            if not _is_array(value)}
         with open(json_file, 'w') as out_file:
-            json.dump(self.__dict__, out_file)
+            json.dump(class_attributes, out_file)
 
     def _load_class(self, class_path):
         json_file = os.path.join(class_path, 'class.json')
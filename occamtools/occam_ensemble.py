@@ -0,0 +1,92 @@
+import os
+import glob
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+from occamtools.occam_data import OccamData
+
+
+def _load_run(run_dir, save_to_npy, kwargs):
+    # Worker loading one run. With save_to_npy, the .npy files are written
+    # (or found up to date) and the run is then loaded from them by the
+    # parent, instead of sending all of its data back.
+    occam_data = OccamData(run_dir, silent=True, save_to_npy=save_to_npy,
+                           **kwargs)
+    return None if save_to_npy else occam_data
+
+
+class OccamEnsemble:
+    def __init__(self, runs, workers=None, silent=False, save_to_npy=True,
+                 **kwargs):
+        # runs is a glob pattern or a list of run directories (or fort.1
+        # files). The runs are loaded in workers processes (all CPUs by
+        # default, no separate processes if 1), each through its class_data
+        # cache. Other keyword arguments are passed on to OccamData.
+        if isinstance(runs, str):
+            run_dirs = sorted(glob.glob(runs))
+        else:
+            run_dirs = list(runs)
+        if not run_dirs:
+            raise ValueError(f'No OCCAM runs found in {runs!r}')
+        for run_dir in run_dirs:
+            if not os.path.exists(run_dir):
+                raise FileNotFoundError(f'Run directory not found, {run_dir}')
+        self.run_dirs = run_dirs
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = min(workers, len(run_dirs))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_load_run, run_dir, save_to_npy,
+                                           kwargs)
+                           for run_dir in run_dirs]
+                if not silent:
+                    futures = tqdm(futures, unit='run')
+                loaded = [future.result() for future in futures]
+            self.runs = [
+                OccamData(run_dir, silent=True, **kwargs)
+                if occam_data is None else occam_data
+                for run_dir, occam_data in zip(run_dirs, loaded)
+            ]
+        else:
+            if not silent:
+                run_dirs = tqdm(run_dirs, unit='run')
+            self.runs = [OccamData(run_dir, silent=True,
+                                   save_to_npy=save_to_npy, **kwargs)
+                         for run_dir in run_dirs]
+
+    def __len__(self):
+        return len(self.runs)
+
+    def __getitem__(self, i):
+        return self.runs[i]
+
+    def __iter__(self):
+        return iter(self.runs)
+
+    def stack(self, key, truncate=False):
+        # Attribute key of all runs stacked into one array, of shape
+        # (n_runs,) + the shape of the attribute in each run. Runs of
+        # different length are cut to the shortest one if truncate is True.
+        values = [getattr(occam_data, key) for occam_data in self.runs]
+        shapes = {np.shape(value) for value in values}
+        if len(shapes) > 1:
+            if not truncate or len({shape[1:] for shape in shapes}) > 1:
+                raise ValueError(f'Can not stack {key} of the runs, the '
+                                 f'shapes differ: {sorted(shapes)}. Use '
+                                 f'truncate=True to cut them to the shortest '
+                                 f'run.')
+            n = min(shape[0] for shape in shapes)
+            values = [value[:n] for value in values]
+        return np.stack([np.asarray(value) for value in values])
+
+    def __getattr__(self, key):
+        # Attributes of the runs, e.g. kinetic_energy or temperature, are
+        # available stacked (see stack).
+        if key.startswith('_') or key in ('runs', 'run_dirs'):
+            raise AttributeError(key)
+        if not hasattr(self.runs[0], key):
+            raise AttributeError(f'{type(self).__name__!r} object has no '
+                                 f'attribute {key!r}')
+        return self.stack(key)
@@ -0,0 +1,117 @@
+import numpy as np
+from concurrent.futures import (ProcessPoolExecutor, wait,
+                                FIRST_COMPLETED)
+from occamtools.occam_data import OccamData
+from occamtools.read_xyz import Xyz
+from occamtools.neighbor_list import cell_pairs
+
+
+def _rdf_frames(positions, box, r_max, bins, ids_a, ids_b):
+    # Pair distance histogram summed over frames of positions, of shape
+    # (n_frames, n_particles, 3). Pairs within one selection of particles
+    # are found once, and counted in both orders.
+    same = np.array_equal(ids_a, ids_b)
+    hist = None
+    for pos in positions:
+        if same:
+            pairs = cell_pairs(pos[ids_a], box=box, cutoff=r_max)
+        else:
+            pairs = cell_pairs(pos[ids_a], pos[ids_b], box=box, cutoff=r_max)
+        for i, j, r in pairs:
+            if not same:
+                # Leave out pairs of a particle with itself.
+                r = r[ids_a[i] != ids_b[j]]
+            hist_, _ = np.histogram(r, bins=bins, range=(0.0, r_max))
+            hist = hist_ if hist is None else hist + hist_
+    if hist is not None and same:
+        hist = 2 * hist
+    return hist
+
+
+def _check_data(data):
+    if not isinstance(data, (OccamData, Xyz)):
+        error_str = (f'Given data must be of type OccamData or Xyz, not '
+                     f'{type(data)}.')
+        raise TypeError(error_str)
+
+
+def _type_indices(data, type_name):
+    if type_name is None:
+        return np.arange(len(data.type))
+    if type_name not in data.type_dict:
+        error_str = (f'Particle type {type_name!r} not found, the types are '
+                     f'{sorted(data.type_dict)}.')
+        raise ValueError(error_str)
+    return np.flatnonzero(np.asarray(data.type)
+                          == data.type_dict[type_name])
+
+
+def rdf(data, type_a=None, type_b=None, r_max=None, bins=100, frames=None,
+        workers=1, frames_per_task=8):
+    # Radial distribution function g(r) of particles of type_b around those
+    # of type_a (names in data.type_dict, all particles if None), averaged
+    # over frames (all if None, or an int, slice, or sequence of frame
+    # indices). bins is as in np.histogram over (0, r_max). Pairs are found
+    # with cell lists and the minimum image convention in the box, so r_max
+    # can be at most half the shortest box length (the default). With
+    # workers > 1, the frames are split among processes. Returns g and the
+    # bin edges.
+    _check_data(data)
+    if data.box is None or data.box[0] is None:
+        raise ValueError('The box is unknown, so the rdf can not be computed.')
+    box = np.asarray(data.box, dtype=np.float64)
+    if r_max is None:
+        r_max = box.min() / 2
+    if not 0 < r_max <= box.min() / 2:
+        error_str = (f'r_max must be positive and at most half the shortest '
+                     f'box length, {box.min() / 2}, not {r_max}.')
+        raise ValueError(error_str)
+    ids_a = _type_indices(data, type_a)
+    ids_b = _type_indices(data, type_b)
+    n_pairs = len(ids_a) * len(ids_b) - len(np.intersect1d(ids_a, ids_b))
+    if n_pairs == 0:
+        raise ValueError(f'No pairs of particles of types {type_a!r} and '
+                         f'{type_b!r}.')
+
+    steps = np.arange(len(data.x))
+    steps = steps[frames] if frames is not None else steps
+    steps = np.atleast_1d(steps)
+    if len(steps) == 0:
+        raise ValueError(f'No frames found in the selected frames, {frames}.')
+
+    def positions(selection):
+        return np.array([[c[t] for c in (data.x, data.y, data.z)]
+                         for t in selection], dtype=np.float64
+                        ).transpose(0, 2, 1)
+
+    _, edges = np.histogram([], bins=bins, range=(0.0, r_max))
+    hist = np.zeros(len(edges) - 1)
+
+    def add(hist_):
+        if hist_ is not None:
+            hist[:] += hist_
+
+    tasks = (steps[i:i + frames_per_task]
+             for i in range(0, len(steps), frames_per_task))
+    if workers > 1:
+        # At most 2 * workers tasks are in flight, so only their positions
+        # are held in memory (and pickled) at any time.
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            for task in tasks:
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending,
+                                         return_when=FIRST_COMPLETED)
+                    for future in done:
+                        add(future.result())
+                pending.add(executor.submit(_rdf_frames, positions(task), box,
+                                            r_max, bins, ids_a, ids_b))
+            for future in pending:
+                add(future.result())
+    else:
+        for task in tasks:
+            add(_rdf_frames(positions(task), box, r_max, bins, ids_a, ids_b))
+
+    shell = 4 * np.pi / 3 * (edges[1:]**3 - edges[:-1]**3)
+    pair_density = n_pairs / float(np.prod(box))
+    return hist / (len(steps) * pair_density * shell), edges
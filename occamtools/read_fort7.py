@@ -1,104 +1,376 @@
 import os
+import re
+import warnings
 import numpy as np
 from tqdm import tqdm
 
 
+_step_label = b'step no.'
+
+
+def _find_cycle_end(data):
+    # Offset of the line starting with ****, which ends the MDCYCLE (the
+    # FINAL AVERAGES follow), or -1. Values too large for their field are
+    # also printed as ****, but not at the start of a line.
+    end = data.find(b'****')
+    while end >= 0:
+        line_start = data.rfind(b'\n', 0, end) + 1
+        if not data[line_start:end].strip():
+            return line_start
+        end = data.find(b'****', data.find(b'\n', end) + 1 or len(data))
+    return -1
+
+
+def _observable_name(label, keywords):
+    # Attribute name for the values printed with label, e.g. 'etot shifted'
+    # gives total_energy (see Fort7.keywords), and an unknown 'PF_press_2'
+    # gives pf_press_2.
+    if label in keywords:
+        return keywords[label]
+    name = re.sub(r'[^0-9a-zA-Z]+', '_', label).strip('_').lower()
+    if not name.isidentifier():
+        name = 'observable_' + name
+    return name
+
+
+def _block_layout(data, complete, block_end):
+    # Layout of the first step block in data: the offset of 'step no.' in its
+    # first line, for each following line with a value the width of the step
+    # field, the keyword ending the line, and its label (the stripped
+    # keyword), and whether the block holds only such lines. The block ends
+    # where the next one starts, or at the end of data if complete is True.
+    # Otherwise, at the end of a file still being written, the block is
+    # taken to end with the block_end label, the last label of the blocks
+    # read before if known. Returns None if data holds no complete block.
+    start = data.find(_step_label)
+    if start < 0:
+        return None
+    line_start = data.rfind(b'\n', 0, start) + 1
+    stop = data.find(_step_label, start + len(_step_label))
+    last = stop < 0 and not complete
+    if last and block_end is None:
+        return None
+    if stop >= 0:
+        stop = data.rfind(b'\n', 0, stop) + 1
+    else:
+        stop = data.rfind(b'\n') + 1
+    layout = []
+    regular = True
+    for line in data[line_start:stop].split(b'\n')[1:-1]:
+        words = line.split(None, 2)
+        if len(words) != 3:
+            regular = False
+            continue
+        width = line.index(words[0]) + len(words[0])
+        label = words[2].decode('latin-1').rstrip()
+        layout.append((width, words[2], label))
+        if last and label == block_end:
+            break
+    if not layout or (last and layout[-1][2] != block_end):
+        return None
+    return start - line_start, layout, regular
+
+
+def _parse_blocks(data, layout, n_columns):
+    # Parse all complete step blocks at the start of data at once, if they
+    # are all laid out like the first one. The step labels, step fields, and
+    # keywords are blanked out, and the remaining values parsed by numpy.
+    # Returns the values and the number of bytes parsed, or None if any
+    # block is laid out differently.
+    step_offset, lines = layout
+    n_lines = len(lines) + 1
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    line_ends = np.flatnonzero(buffer == ord('\n'))
+    n_blocks = len(line_ends) // n_lines
+    if n_blocks == 0:
+        return np.zeros((0, n_columns)), 0
+    line_ends = line_ends[:n_blocks * n_lines]
+    n_bytes = int(line_ends[-1]) + 1
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+    line_starts = line_starts.reshape(n_blocks, n_lines)
+    line_ends = line_ends.reshape(n_blocks, n_lines)
+
+    def matches(positions, expected):
+        expected = np.frombuffer(expected, dtype=np.uint8)
+        return np.array_equal(
+            buffer[positions[:, None] + np.arange(len(expected))],
+            np.broadcast_to(expected, (len(positions), len(expected)))
+        )
+
+    label_start = line_starts[:, 0] + step_offset
+    if (np.any(label_start + len(_step_label) > line_ends[:, 0])
+            or not matches(label_start, _step_label)):
+        return None
+    starts = [label_start]
+    stops = [label_start + len(_step_label)]
+    for j, (width, keyword, _) in enumerate(lines, 1):
+        field_end = line_starts[:, j] + width
+        keyword_start = line_ends[:, j] - len(keyword)
+        if (np.any(keyword_start <= field_end)
+                or not np.all(buffer[field_end] == ord(' '))
+                or not np.all(buffer[keyword_start - 1] == ord(' '))
+                or not matches(keyword_start, keyword)):
+            return None
+        starts += [line_starts[:, j], keyword_start]
+        stops += [field_end, line_ends[:, j]]
+
+    # The blanked intervals do not overlap, nor touch.
+    change = np.zeros(n_bytes + 1, dtype=np.int8)
+    change[np.concatenate(starts)] = 1
+    change[np.concatenate(stops)] = -1
+    text = buffer[:n_bytes].copy()
+    text[np.cumsum(change[:-1], dtype=np.int8).view(bool)] = ord(' ')
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            values = np.fromstring(text.tobytes(), sep=' ')
+    except ValueError:
+        return None
+    if len(values) != n_blocks * n_lines:
+        return None
+
+    values = values.reshape(n_blocks, n_lines)
+    blocks = np.zeros((n_blocks, n_columns))
+    blocks[:, 0] = values[:, 0]
+    for j, (_, _, column) in enumerate(lines, 1):
+        if column is not None:
+            blocks[:, column] = values[:, j]
+    return blocks, n_bytes
+
+
+def _parse_block_lines(data, lookup, end_column, n_columns):
+    # Line by line version of _parse_blocks, for blocks not laid out like
+    # the first one.
+    blocks = []
+    block = None
+    n_bytes = 0
+    n_chars = 0
+    for line in data.decode('latin-1').splitlines(keepends=True):
+        n_chars += len(line)
+        if not line.endswith('\n'):
+            break
+        words = line.split(None, 2)
+        if len(words) == 3:
+            j = lookup.get(words[2].rstrip())
+            if j is not None and block is not None:
+                block[j] = words[1]
+                if j == end_column:
+                    blocks.append(block)
+                    block = None
+                    n_bytes = n_chars
+            elif words[0] == 'step' and words[1] == 'no.':
+                block = ['0'] * n_columns
+                block[0] = words[2]
+    values = np.array(blocks, dtype=np.str_).astype(np.float64)
+    return values.reshape(len(blocks), n_columns), n_bytes
+
+
 class Fort7:
     def __init__(self, file_name):
         self.file_name = file_name
 
-    def _allocate_arrays(self):
-        self.step = np.zeros(self.n_time_steps)
-        self.kinetic_energy = np.zeros(self.n_time_steps)
-        self.potential_energy = np.zeros(self.n_time_steps)
-        self.bond_energy = np.zeros(self.n_time_steps)
-        self.angle_energy = np.zeros(self.n_time_steps)
-        self.temperature = np.zeros(self.n_time_steps)
-        self.pressure = np.zeros(self.n_time_steps)
-        self.pressure_nb = np.zeros(self.n_time_steps)
-        self.pressure_pf_0 = np.zeros(self.n_time_steps)
-        self.pressure_pf_1 = np.zeros(self.n_time_steps)
-
-    def _prune_arrays(self):
-        i = self.current_index
-        self.step = self.step[:i]
-        self.kinetic_energy = self.kinetic_energy[:i]
-        self.potential_energy = self.potential_energy[:i]
-        self.bond_energy = self.bond_energy[:i]
-        self.angle_energy = self.angle_energy[:i]
-        self.temperature = self.temperature[:i]
-        self.pressure = self.pressure[:i]
-        self.pressure_nb = self.pressure_nb[:i]
-        self.pressure_pf_0 = self.pressure_pf_0[:i]
-        self.pressure_pf_1 = self.pressure_pf_1[:i]
-
-    def _parse_cycle(self, in_file, lines_parsed, silent):
-        self.current_index = 0
+    # Attribute names of the quantities printed in each step block of the
+    # MDCYCLE, by their label (the keyword following the value on their line).
+    # Quantities with other labels are named after the label (see
+    # _observable_name).
+    keywords = {
+        'vbond': 'bond_energy',
+        'vangle_cos': 'angle_cos_energy',
+        'vangle': 'angle_energy',
+        'nonbond inter': 'nonbond_inter_energy',
+        'nonbond intra': 'nonbond_intra_energy',
+        'vscf1': 'scf_energy_1',
+        'vscf2': 'scf_energy_2',
+        'v_scf': 'scf_energy',
+        'P_scf zero': 'p_scf_zero',
+        'wr1': 'w_r_1',
+        'wr2': 'w_r_2',
+        'wr3': 'w_r_3',
+        'wr4': 'w_r_4',
+        'A': 'a',
+        'P_scf zero + A': 'p_scf_zero_a',
+        'W[phi(r)]': 'w_phi',
+        'nonbond total': 'nonbond_energy',
+        'nonbond tot + mean field': 'nonbond_mean_field_energy',
+        'ekin': 'kinetic_energy',
+        'epot non-shifted': 'potential_energy_non_shifted',
+        'epot shifted': 'potential_energy',
+        'etot non-shifted': 'total_energy_non_shifted',
+        'etot shifted': 'total_energy',
+        'temp': 'temperature',
+        'press': 'pressure',
+        'PP_press_': 'pressure_nb',
+        'PF_press_0': 'pressure_pf_0',
+        'PF_press_1': 'pressure_pf_1',
+        'PF_press_1_xx': 'pressure_pf_1_xx',
+        'PF_press_1_yy': 'pressure_pf_1_yy',
+        'PF_press_1_zz': 'pressure_pf_1_zz',
+        'dens': 'density',
+        'bond virial': 'bond_virial',
+        'angle virial': 'angle_virial',
+        'nonbonded virial': 'nonbonded_virial',
+    }
+    # Last label of the step blocks, taken from the first block, used to
+    # tell if a block at the end of a file still being written is complete.
+    # Until it is known, the first block is complete once the next one (or
+    # the FINAL AVERAGES) starts.
+    block_end = None
+
+    # Attribute names (prefixed with average_) of the averages in the FINAL
+    # AVERAGES block, by their label, where these differ from the per step
+    # ones.
+    final_keywords = {'total press': 'pressure'}
+
+    chunk_size = 2**26
+
+    def _parse_cycle(self, in_file, chars_parsed, silent):
+        # The observables are the labels found in the first step block, each
+        # stored as a column of the structured array observables, and as an
+        # attribute viewing the column. The step blocks are read in chunks of
+        # about chunk_size bytes, and parsed in bulk if laid out like the
+        # first block (which they are in files written by OCCAM), otherwise
+        # line by line.
+
+        # Byte offset of the end of the last complete step block, used to
+        # continue reading a file which is still being written to.
+        self.bytes_read = chars_parsed
+        file_size = os.path.getsize(self.file_name)
         if not silent:
-            pbar = tqdm(total=self.num_lines - lines_parsed)
-        else:
-            pbar = None
-        while self._parse_step(in_file, pbar):
-            self.current_index += 1
+            pbar = tqdm(total=file_size - chars_parsed, unit='B',
+                        unit_scale=True)
+
+        names = ['step']
+        blocks = []
+        layout = None
+        data = b''
+        while True:
+            chunk = in_file.read(self.chunk_size)
+            data += chunk
+            end = _find_cycle_end(data)
+            if end >= 0:
+                data = data[:end]
+            if layout is None:
+                layout = _block_layout(data, end >= 0, self.block_end)
+                if layout is not None:
+                    step_offset, lines, regular = layout
+                    self.block_end = lines[-1][2]
+                    lookup = {}
+                    for _, _, label in lines:
+                        name = _observable_name(label, self.keywords)
+                        if name not in names:
+                            names.append(name)
+                        lookup[label] = names.index(name)
+                    end_column = lookup[lines[-1][2]]
+                    lines = [(width, keyword, lookup[label])
+                             for width, keyword, label in lines]
+            if layout is not None:
+                parsed = None
+                if regular:
+                    parsed = _parse_blocks(data, (step_offset, lines),
+                                           len(names))
+                if parsed is None:
+                    parsed = _parse_block_lines(data, lookup, end_column,
+                                                len(names))
+                values, n_bytes = parsed
+                blocks.append(values)
+                self.bytes_read += n_bytes
+                data = data[n_bytes:]
+            if not silent:
+                pbar.update(self.bytes_read + len(data) - chars_parsed
+                            - pbar.n)
+            if end >= 0 or not chunk:
+                break
+        # Anything after the last complete block belongs to an incomplete
+        # block, i.e. a crashed or still running simulation, and is
+        # discarded.
+
         if not silent:
-            pbar.update(self.num_lines - lines_parsed - pbar.n)
+            pbar.update(file_size - chars_parsed - pbar.n)
             pbar.close()
-        self._prune_arrays()
-        self._parse_final_avg(in_file)
+        if blocks:
+            values = np.concatenate(blocks)
+        else:
+            values = np.zeros((0, len(names)))
+        self.observable_names = names
+        self.observables = values.view(
+            np.dtype([(name, np.float64) for name in names])
+        ).reshape(-1)
+        for name in names:
+            setattr(self, name, self.observables[name])
+        self.current_index = len(self.observables)
+        if end >= 0:
+            in_file.seek(self.bytes_read + len(data))
+            self._parse_final_avg(in_file)
 
-    def _parse_step(self, in_file, pbar):
-        i = self.current_index
+    def _parse_final_avg(self, in_file):
+        # The averages in the FINAL AVERAGES block are stored as attributes
+        # named like the per step arrays, prefixed with average_, and
+        # collected in the final_averages dict. in_file is positioned at the
+        # start of the block.
+        keywords = {**self.keywords, **self.final_keywords}
+        for line in in_file.read().decode('latin-1').splitlines():
+            words = line.split()
+            if words[:2] == ['step', 'no.'] and len(words) == 3:
+                self.final_step = int(words[2])
+                continue
+            words = line.split(None, 1)
+            if len(words) != 2:
+                continue
+            try:
+                value = float(words[0])
+            except ValueError:
+                continue
+            name = 'average_' + _observable_name(words[1].strip(), keywords)
+            self.final_averages[name] = value
+            setattr(self, name, value)
+
+    def _seek_final_avg(self, in_file, max_bytes=2**20):
+        # Position in_file at the start of the FINAL AVERAGES block, searching
+        # backwards from the end of the file. Returns False if there is none
+        # within the last max_bytes bytes, i.e. the run did not finish.
+        file_size = in_file.seek(0, os.SEEK_END)
+        n_bytes = 2**12
         while True:
-            if pbar is not None:
-                pbar.update(1)
-            line = in_file.readline().strip().split()
-            if line:  # Make sure the line isnt empty, ''
-                if 'nonbonded virial' in ' '.join(line):
-                    return True
-                if '****' in ' '.join(line):
-                    return False
-
-                if 'step no' in ' '.join(line):
-                    self.step[i] = int(line[-1])
-                elif 'ekin' in line[-1]:
-                    self.kinetic_energy[i] = float(line[1])
-                elif 'epot shifted' in ' '.join(line):
-                    self.potential_energy[i] = float(line[1])
-                elif 'vbond' in ' '.join(line):
-                    self.bond_energy[i] = float(line[1])
-                elif 'vangle' in ' '.join(line):
-                    self.angle_energy[i] = float(line[1])
-                elif 'temp' in line[-1]:
-                    self.temperature[i] = float(line[1])
-                elif line[-1] == 'press':
-                    self.pressure[i] = float(line[1])
-                elif 'PP_press_' in ' '.join(line):
-                    self.pressure_nb[i] = float(line[1])
-                elif 'PF_press_0' in ' '.join(line):
-                    self.pressure_pf_0[i] = float(line[1])
-                elif 'PF_press_1' in ' '.join(line):
-                    self.pressure_pf_1[i] = float(line[1])
+            start = max(file_size - n_bytes, 0)
+            in_file.seek(start)
+            data = in_file.read(file_size - start)
+            i = data.rfind(b'FINAL AVERAGES')
+            if i >= 0:
+                in_file.seek(start + data.rfind(b'\n', 0, i) + 1)
+                return True
+            if start == 0 or n_bytes >= max_bytes:
+                return False
+            n_bytes *= 4
 
-    def _parse_final_avg(self, in_file):
-        pass
+    def read_appended(self, offset, silent=True):
+        # Parse only the complete step blocks following byte offset, the end
+        # of a previously read block (see bytes_read), e.g. blocks written
+        # since a running simulation was last loaded. Returns the number of
+        # blocks read.
+        with open(self.file_name, 'rb') as in_file:
+            in_file.seek(offset)
+            self.final_averages = {}
+            self._parse_cycle(in_file, offset, silent)
+        return self.current_index
 
-    def read_file(self, file_name=None, silent=False):
+    def read_file(self, file_name=None, silent=False, summary_only=False):
+        # With summary_only, only the header and the FINAL AVERAGES block
+        # (found from the end of the file) are read, not the step blocks.
         if file_name is not None:
             self.file_name = file_name
         if not silent:
             print('Loading fort.7 data from file:\n'
                   + os.path.abspath(self.file_name))
 
-        # Go through the file initally and just count the number of lines.
-        with open(self.file_name, 'r') as in_file:
-            self.num_lines = sum(1 for line in in_file)
-
-        with open(self.file_name, 'r') as in_file:
-            lines_parsed = 0
+        with open(self.file_name, 'rb') as in_file:
+            chars_parsed = 0
             while True:
-                lines_parsed += 1
                 line = in_file.readline()
-                line = line.split()
+                if not line:
+                    raise ValueError('No MDCYCLE block found in fort.7 file '
+                                     + self.file_name)
+                chars_parsed += len(line)
+                line = line.decode('latin-1').split()
                 if line:  # Make sure the line isnt empty, ''
                     if 'title' in line[0]:
                         self.title = line[1].strip()
@@ -107,7 +379,9 @@ class Fort7:
                     elif 'cutoff' in line[0]:
                         self.cutoff = float(line[-1].strip())
                     elif 'box' in line[0]:
-                        line = in_file.readline().split()
+                        line = in_file.readline()
+                        chars_parsed += len(line)
+                        line = line.decode('latin-1').split()
                         self.box = np.array([float(b) for b in line])
                     elif 'number of time steps' in ' '.join(line):
                         self.n_time_steps = int(line[-1])
@@ -116,5 +390,8 @@ class Fort7:
                     elif 'MDCYCLE' in line:
                         break
 
-            self._allocate_arrays()
-            self._parse_cycle(in_file, lines_parsed, silent)
+            self.final_averages = {}
+            if not summary_only:
+                self._parse_cycle(in_file, chars_parsed, silent)
+            elif self._seek_final_avg(in_file):
+                self._parse_final_avg(in_file)
@@ -1,4 +1,10 @@
 import os
+import re
+import shutil
+import tempfile
+import itertools as it
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
 from tqdm import tqdm
 
@@ -15,21 +21,286 @@ def _are_floats(*args):
     return are_floats
 
 
-class Xyz:
+def _parse_frame(lines, n_columns):
+    # Convert a block of atom lines to floats in one pass, skipping the label
+    # column.
+    return np.loadtxt(lines, usecols=range(1, n_columns), ndmin=2)
+
+
+def _parse_fixed_width(block, n_particles, n_values):
+    # Parse atom lines (bytes) of equal length with fixed-point values in
+    # fixed columns, as OCCAM writes them, straight from the bytes. The
+    # columns of each field are taken from the first line, and the digits of
+    # a field summed to an integer which is divided by a power of ten. This
+    # gives the same float as parsing the text, as long as the value has at
+    # most 15 significant digits. Returns None if the lines are laid out
+    # otherwise.
+    if n_particles == 0:
+        return np.zeros((0, n_values))
+    buffer = np.frombuffer(block, dtype=np.uint8)
+    if len(buffer) % n_particles:
+        return None
+    lines = buffer.reshape(n_particles, -1)
+    if not np.all(lines[:, -1] == ord('\n')):
+        return None
+    tokens = [m.span() for m in re.finditer(rb'\S+', lines[0].tobytes())]
+    if len(tokens) != n_values + 1:
+        return None
+
+    # A field may be wider in other lines, up to 18 digits and a sign, but
+    # is separated from the previous one by blanks. The label column is not
+    # checked.
+    columns, points, powers, decimals, gaps = [], [], [], [], []
+    previous = tokens[0][1]
+    for j, (start, end) in enumerate(tokens[1:]):
+        point = lines[0, start:end].tobytes().find(b'.') + start
+        if point < start:
+            return None
+        left = max(previous + 1, end - 19)
+        gaps.extend(range(left - 1 if j == 0 else previous, left))
+        points.append(len(columns) + point - left)
+        columns.extend(range(left, end))
+        power = end - 1 - np.arange(left, end)
+        power[:point - left] -= 1
+        powers.append(power)
+        decimals.append(end - point - 1)
+        previous = end
+    gaps.extend(range(previous, lines.shape[1] - 1))
+    if not np.all(lines[:, gaps] == ord(' ')):
+        return None
+
+    # The fields are gathered as rows, so each field is reduced along the
+    # particles.
+    widths = [len(power) for power in powers]
+    first = np.cumsum([0] + widths[:-1])
+    field = lines.T[columns]
+    digits = field - np.uint8(ord('0'))
+    is_digit = digits < 10
+    space = field == ord(' ')
+    minus = field == ord('-')
+    sign = minus | (field == ord('+'))
+    # Apart from the decimal points, only digits, blanks, and signs.
+    n_chars = (np.count_nonzero(is_digit) + np.count_nonzero(space)
+               + np.count_nonzero(sign) + n_particles * n_values)
+    if not (np.all(field[points] == ord('.')) and n_chars == field.size
+            and np.all(is_digit[first + widths - np.int64(1)])):
+        return None
+    # Every value is a single run of characters, with any sign first. The
+    # last character of every field is a digit, so there is at least one run
+    # per field.
+    used = ~space
+    before = np.zeros_like(used)
+    before[1:] = used[:-1]
+    before[first] = False
+    if (np.count_nonzero(used & ~before) != n_particles * n_values
+            or np.any(sign & before)):
+        return None
+
+    # The partial sums are integers no larger than the total, so the sum is
+    # exact below 2**53.
+    weights = np.zeros((n_values, len(columns)))
+    field_index = np.repeat(np.arange(n_values), widths)
+    weights[field_index, np.arange(len(columns))] = 10.0**np.concatenate(
+        powers)
+    integers = weights @ (digits * is_digit).astype(np.float64)
+    if np.any(integers >= 2**53):
+        return None
+    values = integers / 10.0**np.array(decimals)[:, np.newaxis]
+    for j, start in enumerate(first):
+        if np.any(minus[start:start + widths[j]]):
+            negative = np.any(minus[start:start + widths[j]], axis=0)
+            values[j, negative] *= -1
+    return values.T
+
+
+def _atom_lines(block):
+    # Atom lines of a frame, given as bytes, as a list of strings.
+    return bytes(block).decode().splitlines(keepends=True)
+
+
+def _parse_block(block, n_particles, n_columns):
+    # Parse the atom lines of a frame, given as bytes, as fixed-width
+    # columns if possible, and with _parse_frame otherwise.
+    values = _parse_fixed_width(block, n_particles, n_columns - 1)
+    if values is None:
+        values = _parse_frame(_atom_lines(block), n_columns)
+    return values
+
+
+def _split_frames(data, n_particles):
+    # Split the complete frames at the start of data into their comment
+    # line, atom lines (kept as bytes), and size in bytes.
+    lines_per_frame = n_particles + 2
+    line_ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8)
+                               == ord('\n')) + 1
+    n_frames = len(line_ends) // lines_per_frame
+    line_ends = line_ends[:n_frames * lines_per_frame]
+    data = memoryview(data)
+    frames = []
+    start = 0
+    for ends in line_ends.reshape(n_frames, lines_per_frame):
+        comment = bytes(data[ends[0]:ends[1]]).decode()
+        end = int(ends[-1])
+        frames.append((comment, data[ends[1]:end], end - start))
+        start = end
+    return frames
+
+
+def _type_dtype(type_dict):
+    # Smallest unsigned integer type able to hold every particle type id.
+    return np.min_scalar_type(max(len(type_dict) - 1, 0))
+
+
+def _split_frame(buffer, offsets, frame):
+    # Split a single frame from a memory-mapped file into its comment line
+    # and atom lines, the latter kept as bytes.
+    data = buffer[offsets[frame]:offsets[frame + 1]]
+    line_ends = np.flatnonzero(data == ord('\n')) + 1
+    comment = data[line_ends[0]:line_ends[1]].tobytes().decode()
+    return comment, data[line_ends[1]:]
+
+
+def _decode_frame_range(file_name, offsets, first_frame, n_columns,
+                        comment_format_known, out_files):
+    # Worker for Xyz.read_file_parallel. Decodes the frames delimited by the
+    # byte offsets straight into the memory-mapped output .npy files, so no
+    # arrays are sent back to the parent process.
+    buffer = np.memmap(file_name, dtype=np.uint8, mode='r')
+    arrays = {key: np.load(out_file, mmap_mode='r+')
+              for key, out_file in out_files.items()}
+    keys = ['x', 'y', 'z', 'vx', 'vy', 'vz'][:n_columns - 1]
+    for i in range(len(offsets) - 1):
+        comment, block = _split_frame(buffer, offsets, i)
+        time_step = first_frame + i
+        if comment_format_known:
+            arrays['time'][time_step] = float(comment.split()[0])
+        values = _parse_block(block, arrays['x'].shape[1], n_columns)
+        for j, key in enumerate(keys):
+            arrays[key][time_step, :] = values[:, j]
+    for array in arrays.values():
+        array.flush()
+    return len(offsets) - 1
+
+
+class XyzIndex:
+    extension = '.index.npz'
+
     def __init__(self, file_name):
+        self.file_name = file_name
+        self.index_file_name = file_name + self.extension
+
+    @property
+    def n_frames(self):
+        return len(self.offsets) - 1
+
+    def _fingerprint(self):
+        stat = os.stat(self.file_name)
+        return stat.st_size, stat.st_mtime_ns
+
+    def build(self, chunk_size=2**24, start=0):
+        # Frames are indexed from byte offset start, which must be the start
+        # of a frame.
+        with open(self.file_name, 'r') as in_file:
+            self.n_particles = int(in_file.readline())
+        self.file_size, self.mtime = self._fingerprint()
+        lines_per_frame = self.n_particles + 2
+
+        # Scan the memory-mapped file for newlines in fixed size chunks,
+        # keeping the offset just past the last line of every frame. Only
+        # complete frames end up in the index, so a truncated final frame is
+        # ignored.
+        offsets = [np.array([start], dtype=np.int64)]
+        if start >= self.file_size:
+            self.offsets = offsets[0]
+            return self
+        buffer = np.memmap(self.file_name, dtype=np.uint8, mode='r')
+        n_lines = 0
+        for start in range(start, self.file_size, chunk_size):
+            chunk = buffer[start:start + chunk_size]
+            newlines = np.flatnonzero(chunk == ord('\n'))
+            line_numbers = n_lines + np.arange(1, len(newlines) + 1)
+            frame_ends = newlines[line_numbers % lines_per_frame == 0]
+            offsets.append(frame_ends.astype(np.int64) + start + 1)
+            n_lines += len(newlines)
+        del buffer
+        self.offsets = np.concatenate(offsets)
+        return self
+
+    def save(self):
+        np.savez(self.index_file_name, offsets=self.offsets,
+                 n_particles=self.n_particles, file_size=self.file_size,
+                 mtime=self.mtime)
+
+    def load(self):
+        # Returns False if no index exists, or if the indexed file has changed
+        # since the index was built.
+        if not os.path.exists(self.index_file_name):
+            return False
+        with np.load(self.index_file_name) as index:
+            if (int(index['file_size']), int(index['mtime'])) != (
+                    self._fingerprint()):
+                return False
+            self.offsets = index['offsets']
+            self.n_particles = int(index['n_particles'])
+            self.file_size = int(index['file_size'])
+            self.mtime = int(index['mtime'])
+        return True
+
+
+class Xyz:
+    def __init__(self, file_name, dtype=None):
         self.file_name = file_name
         self.velocities = False
+        # With dtype=None positions, velocities and types are float64. Any
+        # other dtype (e.g. np.float32) is used for positions and velocities,
+        # and types are stored as the smallest fitting unsigned integer.
+        self.dtype = None if dtype is None else np.dtype(dtype).name
+
+    def _float_dtype(self):
+        return np.float64 if self.dtype is None else self.dtype
 
     def _allocate_arrays(self):
+        shape = (self.n_time_steps_, self.n_particles)
+        dtype = self._float_dtype()
         self.type = np.zeros(self.n_particles)
         self.time = np.zeros(self.n_time_steps_)
-        self.x = np.zeros(shape=(self.n_time_steps_, self.n_particles))
-        self.y = np.zeros(shape=(self.n_time_steps_, self.n_particles))
-        self.z = np.zeros(shape=(self.n_time_steps_, self.n_particles))
+        self.x = np.zeros(shape=shape, dtype=dtype)
+        self.y = np.zeros(shape=shape, dtype=dtype)
+        self.z = np.zeros(shape=shape, dtype=dtype)
+        if self.velocities:
+            self.vx = np.zeros(shape=shape, dtype=dtype)
+            self.vy = np.zeros(shape=shape, dtype=dtype)
+            self.vz = np.zeros(shape=shape, dtype=dtype)
+
+    def _store_frame(self, time_step, values):
+        self.x[time_step, :] = values[:, 0]
+        self.y[time_step, :] = values[:, 1]
+        self.z[time_step, :] = values[:, 2]
         if self.velocities:
-            self.vx = np.zeros(shape=(self.n_time_steps_, self.n_particles))
-            self.vy = np.zeros(shape=(self.n_time_steps_, self.n_particles))
-            self.vz = np.zeros(shape=(self.n_time_steps_, self.n_particles))
+            self.vx[time_step, :] = values[:, 3]
+            self.vy[time_step, :] = values[:, 4]
+            self.vz[time_step, :] = values[:, 5]
+
+    def _subset(self, n_time_steps):
+        # Empty Xyz object sharing the particle types and box of this one,
+        # with room for n_time_steps frames.
+        subset = Xyz(self.file_name, dtype=self.dtype)
+        subset.n_particles = self.n_particles
+        subset.velocities = self.velocities
+        subset.n_time_steps_ = n_time_steps
+        subset._allocate_arrays()
+        subset.type = self.type
+        subset.type_dict = self.type_dict
+        subset.box = self.box
+        subset.comment_format_known = self.comment_format_known
+        return subset
+
+    def _parse_first_frame(self, comment, lines):
+        if lines and len(lines[0].split()) == 7:
+            self.velocities = True
+        self._allocate_arrays()
+        self._parse_comment_first(comment)
+        self._parse_types(lines)
 
     def _parse_comment_first(self, line):
         line = line.split()
@@ -51,19 +322,67 @@ class Xyz:
             self.box = np.array(self.box)
         self.comment_format_known = recognized
 
-    def _parse_types(self, in_file):
-        in_file.seek(0)  # Reset position to the start of the file
+    def _parse_types(self, lines):
         self.type_dict = {}
         ind = 0
-        for _ in range(2):
-            line = in_file.readline()
-        for i in range(self.n_particles):
-            line = in_file.readline().split()
-            t = line[0]
+        for i, line in enumerate(lines):
+            t = line.split()[0]
             if t not in self.type_dict:
                 self.type_dict[t] = ind
                 ind += 1
             self.type[i] = self.type_dict[t]
+        if self.dtype is not None:
+            self.type = self.type.astype(_type_dtype(self.type_dict))
+
+    def _trajectory_arrays(self):
+        keys = ['time', 'x', 'y', 'z']
+        if self.velocities:
+            keys += ['vx', 'vy', 'vz']
+        return keys
+
+    def _resize_arrays(self, n_time_steps):
+        for key in self._trajectory_arrays():
+            old = getattr(self, key)
+            new = np.zeros(shape=(n_time_steps,) + old.shape[1:],
+                           dtype=old.dtype)
+            n = min(n_time_steps, old.shape[0])
+            new[:n] = old[:n]
+            setattr(self, key, new)
+        self.n_time_steps_ = n_time_steps
+
+    chunk_size = 2**24
+
+    def _read_frames(self, in_file):
+        # Yields (comment line, parsed values, bytes read) for every complete
+        # frame in the binary file in_file, which is read in chunks of about
+        # chunk_size bytes. A truncated final frame (e.g. from a crashed run)
+        # is dropped with a warning. OCCAM terminates every line, so a final
+        # line without a newline may hold a partially written number and is
+        # also treated as truncated.
+        n_columns = 7 if self.velocities else 4
+        data = b''
+        while True:
+            chunk = in_file.read(self.chunk_size)
+            data += chunk
+            frames = _split_frames(data, self.n_particles)
+            n_bytes = 0
+            for i, (comment, block, size) in enumerate(frames):
+                try:
+                    values = _parse_block(block, self.n_particles, n_columns)
+                except ValueError:
+                    if (chunk or i < len(frames) - 1
+                            or data[n_bytes + size:].strip()):
+                        raise
+                    break
+                yield comment, values, size
+                n_bytes += size
+            del frames
+            data = data[n_bytes:]
+            if not chunk:
+                break
+        if data.strip():
+            warnings.warn('Ignoring truncated final frame in file '
+                          + self.file_name)
 
     def read_file(self, file_name=None, save=True, silent=False):
         if file_name is not None:
@@ -72,42 +391,214 @@ class Xyz:
             print('Loading fort.8 data from file:\n'
                   + os.path.abspath(self.file_name))
 
-        # Go through the file initally and just count the number of lines.
+        file_size = os.path.getsize(self.file_name)
         with open(self.file_name, 'r') as in_file:
-            self.num_lines = sum(1 for line in in_file)
+            header = in_file.readline()
+            self.n_particles = int(header)
+            comment = in_file.readline()
+            lines = list(it.islice(in_file, self.n_particles))
+
+        # Estimate the number of frames from the size of the first one, which
+        # is exact for fixed-width output. If the estimate is too small, the
+        # arrays are grown to fit the frames estimated from the bytes left
+        # and the mean size of the frames read so far, and trimmed at the
+        # end, so the file is only read once.
+        frame_size = len(header) + len(comment) + sum(map(len, lines))
+        self.n_time_steps_ = max(1, -(-file_size // frame_size))
+        self._parse_first_frame(comment, lines)
+
+        if not silent:
+            pbar = tqdm(total=file_size, unit='B', unit_scale=True)
+        # Byte offset of the end of the last complete frame, used to continue
+        # reading a file which is still being written to.
+        self.bytes_read = 0
+        time_step = 0
+        with open(self.file_name, 'rb') as in_file:
+            for comment, values, n_bytes in self._read_frames(in_file):
+                if time_step >= self.n_time_steps_:
+                    n_left = -(-(file_size - self.bytes_read) * time_step
+                               // self.bytes_read)
+                    self._resize_arrays(time_step + max(n_left, 1))
+                if self.comment_format_known:
+                    self.time[time_step] = float(comment.split()[0])
+                self._store_frame(time_step, values)
+                time_step += 1
+                self.bytes_read += n_bytes
+                if not silent:
+                    pbar.update(n_bytes)
+        if not silent:
+            pbar.update(file_size - pbar.n)
+            pbar.close()
+
+        if time_step != self.n_time_steps_:
+            self._resize_arrays(time_step)
 
+    def build_index(self, save=True, rebuild=False):
+        self.index = XyzIndex(self.file_name)
+        if rebuild or not self.index.load():
+            self.index.build()
+            if save:
+                try:
+                    self.index.save()
+                except OSError:
+                    warnings.warn('Could not save frame index to file '
+                                  + self.index.index_file_name)
+        return self.index
+
+    def _read_indexed(self, index, frame_numbers):
+        buffer = np.memmap(self.file_name, dtype=np.uint8, mode='r')
+        self.n_particles = index.n_particles
+        # The types and box are parsed from the first frame of the file, so
+        # an empty selection gives arrays of shape (0, n_particles).
+        self.n_time_steps_ = 1
+        comment, block = _split_frame(buffer, index.offsets, 0)
+        self._parse_first_frame(comment, _atom_lines(block))
+        if len(frame_numbers) != 1:
+            self._resize_arrays(len(frame_numbers))
+
+        n_columns = 7 if self.velocities else 4
+        for time_step, frame in enumerate(frame_numbers):
+            comment, block = _split_frame(buffer, index.offsets, frame)
+            if self.comment_format_known:
+                self.time[time_step] = float(comment.split()[0])
+            self._store_frame(time_step, _parse_block(block, self.n_particles,
+                                                      n_columns))
+
+    def read_appended(self, offset):
+        # Parse only the complete frames following byte offset, the end of a
+        # previously read frame (see bytes_read), e.g. frames written since a
+        # running simulation was last loaded. Returns the number of frames
+        # read.
+        index = XyzIndex(self.file_name).build(start=offset)
+        with open(self.file_name, 'rb') as in_file:
+            in_file.seek(offset)
+            header = in_file.readline()
+        if header and header.strip() != str(index.n_particles).encode():
+            raise ValueError(f'Byte offset {offset} is not the start of a '
+                             f'frame in file {self.file_name}')
+        self.bytes_read = int(index.offsets[-1])
+        if index.n_frames > 0:
+            self._read_indexed(index, np.arange(index.n_frames))
+        return index.n_frames
+
+    def frames(self, key=slice(None)):
+        # Decode only the requested frames (an int, slice, or sequence of
+        # frame numbers) into a new Xyz object, using the byte offsets of
+        # the frame index.
+        if getattr(self, 'index', None) is None:
+            self.build_index()
+        frame_numbers = np.arange(self.index.n_frames)[key]
+        subset = Xyz(self.file_name, dtype=self.dtype)
+        subset._read_indexed(self.index, np.atleast_1d(frame_numbers))
+        return subset
+
+    def __getitem__(self, key):
+        return self.frames(key)
+
+    def iter_frames(self, chunk=1):
+        # Stream the trajectory as Xyz objects holding at most chunk frames
+        # each, so memory use does not depend on the length of the run. As
+        # in read_file, bytes_read is the end of the last frame yielded.
+        if not (isinstance(chunk, int) and chunk >= 1):
+            raise ValueError(f'chunk must be a positive integer, not {chunk}')
+        header = Xyz(self.file_name, dtype=self.dtype)
         with open(self.file_name, 'r') as in_file:
-            for _ in range(3):
-                line = in_file.readline()
-            if len(line.split()) == 7:
-                self.velocities = True
-            in_file.seek(0)
+            header.n_particles = int(in_file.readline())
+            comment = in_file.readline()
+            lines = list(it.islice(in_file, header.n_particles))
+        header.n_time_steps_ = 1
+        header._parse_first_frame(comment, lines)
 
-            self.n_particles = int(in_file.readline())
-            self.n_time_steps_ = self.num_lines // (self.n_particles + 2)
-            self._allocate_arrays()
-            line = in_file.readline()
-            self._parse_comment_first(line)
-            self._parse_types(in_file)
-
-            in_file.seek(0)
-            if silent:
-                range_obj = range(self.n_time_steps_)
+        self.bytes_read = 0
+        with open(self.file_name, 'rb') as in_file:
+            frames = header._read_frames(in_file)
+            while True:
+                batch = list(it.islice(frames, chunk))
+                if not batch:
+                    return
+                subset = header._subset(len(batch))
+                for time_step, (comment, values, n_bytes) in enumerate(batch):
+                    if subset.comment_format_known:
+                        subset.time[time_step] = float(comment.split()[0])
+                    subset._store_frame(time_step, values)
+                    self.bytes_read += n_bytes
+                yield subset
+
+    def read_file_parallel(self, file_name=None, workers=None, out_dir=None,
+                           silent=False):
+        # Decode contiguous ranges of frames in a pool of worker processes.
+        # The workers write into .npy files in out_dir, which are returned as
+        # memory-mapped arrays. Without an out_dir, a temporary directory is
+        # used and the arrays are read into memory.
+        if file_name is not None:
+            self.file_name = file_name
+        if not silent:
+            print('Loading fort.8 data from file:\n'
+                  + os.path.abspath(self.file_name))
+        if workers is None:
+            workers = os.cpu_count()
+
+        index = self.build_index()
+        if index.n_frames == 0:
+            raise ValueError('No complete frame found in file '
+                             + self.file_name)
+        buffer = np.memmap(self.file_name, dtype=np.uint8, mode='r')
+        comment, block = _split_frame(buffer, index.offsets, 0)
+        lines = _atom_lines(block)
+        del buffer, block
+        header = Xyz(self.file_name, dtype=self.dtype)
+        header.n_particles = index.n_particles
+        header.n_time_steps_ = 1
+        header._parse_first_frame(comment, lines)
+        for key in ('n_particles', 'velocities', 'type', 'type_dict', 'box',
+                    'comment_format_known'):
+            setattr(self, key, getattr(header, key))
+        self.n_time_steps_ = index.n_frames
+        self.bytes_read = int(index.offsets[-1])
+
+        temporary = out_dir is None
+        if temporary:
+            out_dir = tempfile.mkdtemp()
+        elif not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        out_files = {}
+        for key in self._trajectory_arrays():
+            shape = (self.n_time_steps_,)
+            dtype = self._float_dtype()
+            if key == 'time':
+                dtype = np.float64
             else:
-                range_obj = tqdm(range(self.n_time_steps_))
+                shape = shape + (self.n_particles,)
+            out_files[key] = os.path.join(out_dir, key + '.npy')
+            np.lib.format.open_memmap(out_files[key], mode='w+',
+                                      dtype=dtype, shape=shape)
 
-            for time_step in range_obj:
-                for _ in range(2):
-                    line = in_file.readline()
-                if self.comment_format_known:
-                    self.time[time_step] = float(line.split()[0])
-                for i in range(self.n_particles):
-                    line = in_file.readline().split()
-                    self.x[time_step, i] = float(line[1])
-                    self.y[time_step, i] = float(line[2])
-                    self.z[time_step, i] = float(line[3])
-
-                    if self.velocities:
-                        self.vx[time_step, i] = float(line[4])
-                        self.vy[time_step, i] = float(line[5])
-                        self.vz[time_step, i] = float(line[6])
+        # Use a few more tasks than workers to even out the load.
+        n_columns = 7 if self.velocities else 4
+        frame_ranges = np.array_split(np.arange(self.n_time_steps_),
+                                      4 * workers)
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(_decode_frame_range, self.file_name,
+                                    index.offsets[f[0]:f[-1] + 2], int(f[0]),
+                                    n_columns, self.comment_format_known,
+                                    out_files)
+                    for f in frame_ranges if len(f) > 0
+                ]
+                if not silent:
+                    pbar = tqdm(total=self.n_time_steps_)
+                for future in as_completed(futures):
+                    n_frames = future.result()
+                    if not silent:
+                        pbar.update(n_frames)
+                if not silent:
+                    pbar.close()
+            for key, out_file in out_files.items():
+                if temporary:
+                    setattr(self, key, np.load(out_file))
+                else:
+                    setattr(self, key, np.load(out_file, mmap_mode='r+'))
+        finally:
+            if temporary:
+                shutil.rmtree(out_dir)
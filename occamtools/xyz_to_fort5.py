@@ -1,7 +1,7 @@
 
 import numpy as np
 from occamtools.generate_fort5 import (_write_box, _write_n_particles,
-                                       _write_molecule)
+                                       _write_molecules)
 from occamtools.fort5_to_xyz import _ensure_inside_box
 
 
@@ -90,12 +90,10 @@ def xyz_to_fort5(file_name, wrap, box, new_file_name='fort.5'):
         _write_box(out_file, box)
         _write_n_particles(out_file, n_molecules)
 
-        for atom_ind in range(1, n_molecules+1):
-            line = in_file.readline().split()
-            label = line[0]
-            pos = [float(l) for l in line[1:]]
-            for i, x in enumerate(pos):
-                pos[i] = _ensure_inside_box(x, box[i], wrap)
-            x, y, z = pos
-            _write_molecule(out_file, atom_ind, x, y, z, label=label)
+        atoms = [in_file.readline() for _ in range(n_molecules)]
+        labels = [atom.split(None, 1)[0] for atom in atoms]
+        positions = np.loadtxt(atoms, usecols=(1, 2, 3), ndmin=2)
+        positions = np.stack([_ensure_inside_box(positions[:, i], box[i], wrap)
+                              for i in range(3)], axis=1)
+        _write_molecules(out_file, *positions.T, label=labels)
     return new_file_name
@@ -0,0 +1,13 @@
+class RecordedReads:
+    # Array wrapper recording the number of columns of every read.
+    def __init__(self, array):
+        self.array = array
+        self.n_columns = []
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, key):
+        values = self.array[key]
+        self.n_columns.append(values.shape[1])
+        return values
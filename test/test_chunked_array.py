@@ -0,0 +1,78 @@
+import os
+import shutil
+import numpy as np
+from occamtools.chunked_array import ChunkedArray
+
+
+def _chunked_path(name):
+    path = os.path.join(os.path.dirname(__file__), name + '.chunks')
+    shutil.rmtree(path, ignore_errors=True)
+    return path
+
+
+def test_chunked_array_indexing():
+    path = _chunked_path('indexing')
+    array = np.random.uniform(size=(23, 17))
+    chunked = ChunkedArray.create(path, array, chunks=(4, 5))
+    assert len(os.listdir(path)) == 6 * 4 + 1
+    chunked = ChunkedArray(path)
+    assert chunked.shape == array.shape
+    assert chunked.dtype == array.dtype
+    for key in (Ellipsis, 3, -1, slice(2, 9), slice(None, None, 3),
+                (slice(None, None, -2), 4), slice(5, 2), (Ellipsis, 7),
+                (slice(1, 20, 4), slice(3, 16, 5)), (slice(-5, None), -3)):
+        assert np.array_equal(chunked[key], array[key])
+    assert np.array_equal(np.asarray(chunked), array)
+
+    caught = False
+    try:
+        chunked[23]
+    except IndexError:
+        caught = True
+    assert caught
+
+    caught = False
+    try:
+        chunked[[1, 2]]
+    except TypeError:
+        caught = True
+    assert caught
+    shutil.rmtree(path)
+
+
+def test_chunked_array_append():
+    path = _chunked_path('append')
+    array = np.random.uniform(size=(10, 3))
+    chunked = ChunkedArray.create(path, array, chunks=(4, 3))
+    for n in (1, 2, 7):
+        rows = np.random.uniform(size=(n, 3))
+        array = np.concatenate((array, rows))
+        chunked.append(rows)
+        assert np.array_equal(chunked[...], array)
+        assert np.array_equal(ChunkedArray(path)[...], array)
+
+    caught = False
+    try:
+        chunked.append(np.zeros((2, 4)))
+    except ValueError:
+        caught = True
+    assert caught
+    shutil.rmtree(path)
+
+
+def test_chunked_array_precision():
+    path = _chunked_path('precision')
+    array = np.random.uniform(0, 10, size=(200, 500))
+    chunked = ChunkedArray.create(path, array, precision=1e-4)
+    assert np.max(np.abs(chunked[...] - array)) <= 0.5e-4 + 1e-12
+    size = sum(os.path.getsize(os.path.join(path, f))
+               for f in os.listdir(path))
+    assert array.nbytes / size > 3
+
+    caught = False
+    try:
+        ChunkedArray.create(path, np.arange(10), precision=1e-4)
+    except TypeError:
+        caught = True
+    assert caught
+    shutil.rmtree(path)
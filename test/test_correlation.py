@@ -0,0 +1,77 @@
+import os
+import numpy as np
+from occamtools.read_xyz import Xyz
+from occamtools.correlation import correlation, autocorrelation, vacf
+from test.helpers import RecordedReads
+
+velocities_file = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                  os.pardir, 'data',
+                                  'example_velocities_fort.8'))
+
+
+def _naive_correlation(a, b):
+    n = len(a)
+    return np.array([np.mean(a[:n - m] * b[m:], axis=0) for m in range(n)])
+
+
+def test_correlation():
+    rng = np.random.default_rng(3)
+    a = rng.normal(size=(40, 6))
+    b = rng.normal(size=(40, 6))
+    assert np.allclose(correlation(a, b), _naive_correlation(a, b))
+    assert np.allclose(autocorrelation(a), _naive_correlation(a, a))
+    assert np.allclose(correlation(a.T, b.T, axis=1),
+                       _naive_correlation(a, b).T)
+    assert np.allclose(correlation(a[:, 0], b[:, 0]),
+                       _naive_correlation(a[:, 0], b[:, 0]))
+
+    fluctuations = a + 10.0 - np.mean(a + 10.0, axis=0)
+    expected = _naive_correlation(fluctuations, fluctuations)
+    corr = autocorrelation(a + 10.0, subtract_mean=True, normalize=True)
+    assert np.allclose(corr, expected / expected[0])
+
+    caught = False
+    try:
+        correlation(a, b[:-1])
+    except ValueError:
+        caught = True
+    assert caught
+
+
+def test_vacf():
+    xyz = Xyz(velocities_file)
+    xyz.read_file(save=False, silent=True)
+    expected = sum(_naive_correlation(v, v).mean(axis=1)
+                   for v in (xyz.vx, xyz.vy, xyz.vz))
+    assert np.allclose(vacf(xyz), expected)
+    assert np.allclose(vacf(xyz, max_values=7), expected)
+    assert np.allclose(vacf(xyz, 'Ar', normalize=True),
+                       expected / expected[0])
+    assert np.allclose(vacf(xyz, dimensions='z'),
+                       _naive_correlation(xyz.vz, xyz.vz).mean(axis=1))
+
+    xyz.velocities = False
+    caught = False
+    try:
+        vacf(xyz)
+    except ValueError:
+        caught = True
+    assert caught
+
+
+def test_vacf_sparse_type():
+    xyz = Xyz(velocities_file)
+    xyz.read_file(save=False, silent=True)
+    rng = np.random.default_rng(4)
+    n_frames, n = 30, 500
+    xyz.vx, xyz.vy, xyz.vz = (rng.normal(size=(n_frames, n))
+                              for _ in range(3))
+    xyz.type_dict = {'A': 0, 'B': 1}
+    xyz.type = (np.arange(n) % 50 == 7).astype(float)
+    ids = np.flatnonzero(xyz.type == 1)
+    expected = sum(_naive_correlation(v[:, ids], v[:, ids]).mean(axis=1)
+                   for v in (xyz.vx, xyz.vy, xyz.vz))
+    xyz.vz = RecordedReads(xyz.vz)
+    assert np.allclose(vacf(xyz, 'B', max_values=30 * 20), expected)
+    assert max(xyz.vz.n_columns) <= 20
+    assert len(xyz.vz.n_columns) == len(ids)
@@ -2,7 +2,8 @@ import os
 import pytest
 import numpy as np
 from occamtools.generate_fort5 import generate_uniform_random
-from occamtools.fort5_to_xyz import fort5_to_xyz, _convert_file_name
+from occamtools.fort5_to_xyz import (fort5_to_xyz, _convert_file_name,
+                                     _ensure_inside_box)
 from test.test_generate_fort5 import _check_remove_file
 
 
@@ -122,3 +123,16 @@ def test_convert_file_name():
     assert '.' in converted_file
     converted_file = converted_file.split('.')
     assert converted_file[-1] == 'xyz'
+
+
+def test_ensure_inside_box():
+    box = 7.25
+    x = np.array([0.0, 1.5, box, 2 * box, box + 1.5, -1.5, -box, -2.5 * box,
+                  3.0e9, -3.0e9])
+    wrapped = _ensure_inside_box(x, box, True)
+    assert np.allclose(wrapped[:8], [0.0, 1.5, box, box, 1.5, box - 1.5,
+                                     0.0, 0.5 * box])
+    assert np.all((wrapped >= 0.0) & (wrapped <= box))
+    assert np.allclose(np.mod(wrapped[8:] - x[8:] + box / 2, box), box / 2)
+    assert _ensure_inside_box(-1.5, box, True) == box - 1.5
+    assert np.array_equal(_ensure_inside_box(x, box, False), x)
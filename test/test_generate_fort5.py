@@ -1,7 +1,12 @@
+import io
 import os
 import pytest
 import numpy as np
-from occamtools.generate_fort5 import generate_uniform_random, generate_fcc
+from occamtools.generate_fort5 import (generate_uniform_random, generate_fcc,
+                                       generate_lattice,
+                                       generate_random_packing)
+from occamtools.generate_fort5 import _write_molecule, _write_molecules
+from occamtools.neighbor_list import neighbor_pairs
 
 
 def _check_remove_file(file_name):
@@ -215,3 +220,135 @@ def test_generate_fcc_positions_velocities():
                 assert float(p) == pytest.approx(0.0, abs=1e-15)
 
     assert _check_remove_file(file_name)
+
+
+def test_write_molecules():
+    rng = np.random.default_rng(5)
+    n = 50
+    # Random, repeated (lattice-like), and signed zero coordinates.
+    x = rng.uniform(-5, 5, size=n)
+    y = np.round(rng.uniform(0, 3, size=n), 1)
+    z = np.zeros(n)
+    z[::3] = -0.0
+    labels = np.array(['Ar', 'C', 'H{1}'])[rng.integers(0, 3, size=n)]
+    label_index = rng.integers(1, 4, size=n)
+    bonds = rng.integers(0, 60, size=(n, 6))
+
+    for velocity in (False, True):
+        expected = io.StringIO()
+        for i in range(n):
+            _write_molecule(expected, i + 3, x[i], y[i], z[i],
+                            label=labels[i], label_index=label_index[i],
+                            velocity=velocity, n_bond=2, bond1=bonds[i, 0],
+                            bond2=bonds[i, 1], bond3=bonds[i, 2],
+                            bond4=bonds[i, 3], bond5=bonds[i, 4],
+                            bond6=bonds[i, 5])
+        out = io.StringIO()
+        _write_molecules(out, x, y, z, label=labels, label_index=label_index,
+                         velocity=velocity, n_bond=2, bonds=bonds, first=3,
+                         chunk=16)
+        assert out.getvalue() == expected.getvalue()
+
+    expected = io.StringIO()
+    for i in range(n):
+        _write_molecule(expected, i + 1, x[i], y[i], z[i], label='{C}')
+    out = io.StringIO()
+    _write_molecules(out, x, y, z, label='{C}')
+    assert out.getvalue() == expected.getvalue()
+
+
+def _read_fort5(file_name):
+    with open(file_name, 'r') as in_file:
+        lines = in_file.read().splitlines()
+    box = np.array([float(b) for b in lines[1].split()[:3]])
+    atoms = [line.split() for line in lines[6::3]]
+    assert int(lines[3]) == len(atoms)
+    positions = np.array([[float(p) for p in atom[4:7]] for atom in atoms])
+    labels = np.array([atom[1] for atom in atoms])
+    label_index = np.array([int(atom[2]) for atom in atoms])
+    return box, positions, labels, label_index
+
+
+def test_generate_lattice():
+    file_name = os.path.join(os.path.dirname(__file__), 'lattice_test.5')
+    a = 1.7
+    # Number of basis sites, nearest neighbour distance, and number of
+    # nearest neighbours.
+    lattices = {'sc': (1, a, 6), 'bcc': (2, a * np.sqrt(3) / 2, 8),
+                'fcc': (4, a / np.sqrt(2), 12),
+                'diamond': (8, a * np.sqrt(3) / 4, 4), 'hcp': (4, a, 12)}
+    for lattice, (n_basis, distance, n_neighbours) in lattices.items():
+        cell_box = [4, 3, 3]
+        n_particles = generate_lattice(cell_box, a, lattice=lattice,
+                                       path=file_name)
+        assert n_particles == n_basis * 36
+        box, positions, labels, _ = _read_fort5(file_name)
+        assert len(positions) == n_particles
+        assert np.all((positions >= 0) & (positions < box))
+        i, j, r = neighbor_pairs(positions, box=box,
+                                 cutoff=1.05 * distance)
+        assert np.allclose(r, distance)
+        assert 2 * len(r) == n_neighbours * n_particles
+    _check_remove_file(file_name)
+
+
+def test_generate_lattice_species():
+    file_name = os.path.join(os.path.dirname(__file__), 'lattice_test.5')
+    species = ['Ga'] * 4 + ['As'] * 4
+    generate_lattice([2, 2, 2], 5.65, lattice='diamond', species=species,
+                     path=file_name)
+    _, _, labels, label_index = _read_fort5(file_name)
+    assert np.array_equal(labels, np.tile(species, 8))
+    assert np.array_equal(label_index, np.where(labels == 'Ga', 1, 2))
+
+    np.random.seed(7)
+    n_particles = generate_lattice([5, 5, 4], 1.0, vacancies=0.1,
+                                   substitutions={'Kr': 0.25, 'Xe': 0.05},
+                                   path=file_name)
+    _, positions, labels, label_index = _read_fort5(file_name)
+    assert n_particles == len(positions) == 360
+    assert len(np.unique(positions, axis=0)) == 360
+    assert np.sum(labels == 'Kr') == 100
+    assert np.sum(labels == 'Xe') == 20
+    assert np.sum(labels == 'Ar') == 240
+    for label in ('Ar', 'Kr', 'Xe'):
+        assert len(np.unique(label_index[labels == label])) == 1
+
+    for kwargs in ({'lattice': 'hex'}, {'species': ['Ar', 'Kr']},
+                   {'vacancies': 0.6, 'substitutions': {'Kr': 0.5}},
+                   {'vacancies': -0.1}):
+        caught = False
+        try:
+            generate_lattice([2, 2, 2], 1.0, path=file_name, **kwargs)
+        except ValueError:
+            caught = True
+        assert caught
+    _check_remove_file(file_name)
+
+
+def test_generate_random_packing():
+    file_name = os.path.join(os.path.dirname(__file__), 'packing_test.5')
+    np.random.seed(3)
+    # A volume fraction of spheres of diameter 1 of 0.25, far above where
+    # uniform random positions overlap.
+    box = [12.0, 8.0, 7.0]
+    n_particles = 320
+    assert generate_random_packing(n_particles, box, 1.0,
+                                   path=file_name) == n_particles
+    file_box, positions, labels, _ = _read_fort5(file_name)
+    assert np.allclose(file_box, box)
+    assert len(positions) == n_particles
+    assert np.all((positions >= 0) & (positions < box))
+    d = positions[:, np.newaxis] - positions[np.newaxis]
+    d -= box * np.round(d / box)
+    r = np.sqrt(np.sum(d**2, axis=-1))
+    assert np.min(r[~np.eye(n_particles, dtype=bool)]) >= 1.0
+
+    for n, min_distance in ((2000, 1.0), (10, 4.5), (10, 0.0)):
+        caught = False
+        try:
+            generate_random_packing(n, box, min_distance, path=file_name)
+        except ValueError:
+            caught = True
+        assert caught
+    _check_remove_file(file_name)
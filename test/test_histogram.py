@@ -1,9 +1,13 @@
 import os
+import pickle
 import numpy as np
 import pytest
 from occamtools.occam_data import OccamData
+from occamtools.read_xyz import Xyz
+from occamtools.chunked_array import ChunkedArray
 from occamtools.histogram import histogram as occamhist
-from occamtools.histogram import _check_time_steps
+from occamtools.histogram import _check_time_steps, _histogram_frames
+from occamtools.histogram import density_histogram, HistogramAccumulator
 
 fort1_file = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir,
                              'data', 'fort.1'))
@@ -94,3 +98,171 @@ def test_histogram_values():
 
     hist, _ = occamhist(x, bins=5, range=(0, 5))
     assert np.allclose(hist, np.array([1, 5, 2, 3, 4]))
+
+
+def test_histogram_iterator():
+    data = OccamData(fort1_file, silent=True, save_to_npy=False)
+    xyz = Xyz(data.xyz_file_name)
+    kwargs = {'bins': 7, 'range': (0, 10)}
+    for dim in ('x', 'y', 'z'):
+        expected, expected_bins = occamhist(data, dimension=dim, **kwargs)
+        for chunk in (1, 5, 100):
+            hist, bins = occamhist(xyz.iter_frames(chunk=chunk),
+                                   dimension=dim, **kwargs)
+            assert np.array_equal(hist, expected)
+            assert np.allclose(bins, expected_bins)
+            hist, _ = occamhist(data.iter_frames(chunk=chunk),
+                                dimension=dim, **kwargs)
+            assert np.array_equal(hist, expected)
+
+    for time_steps in ((0, 0), (2, 7), (3, 100)):
+        if time_steps[1] > len(data.x):
+            expected, _ = occamhist(data, time_steps=(3, len(data.x)),
+                                    **kwargs)
+        else:
+            expected, _ = occamhist(data, time_steps=time_steps, **kwargs)
+        hist, _ = occamhist(xyz.iter_frames(chunk=5), time_steps=time_steps,
+                            **kwargs)
+        assert np.array_equal(hist, expected)
+
+    hist, _ = occamhist(iter(np.split(data.x, 4)), **kwargs)
+    expected, _ = occamhist(data.x, **kwargs)
+    assert np.array_equal(hist, expected)
+
+    for kw, time_steps in (({'bins': 7}, None), (kwargs, (-1, 2)),
+                           (kwargs, (200, 300))):
+        caught = False
+        try:
+            occamhist(xyz.iter_frames(), time_steps=time_steps, **kw)
+        except ValueError:
+            caught = True
+        assert caught is True
+
+
+def test_histogram_float32():
+    data = OccamData(fort1_file, silent=True, save_to_npy=False)
+    data_32 = OccamData(fort1_file, silent=True, save_to_npy=False,
+                        load_from_npy=False, dtype=np.float32)
+    kwargs = {'bins': 10, 'range': (0, 10)}
+    hist, bins = occamhist(data, dimension='y', **kwargs)
+    hist_32, bins_32 = occamhist(data_32, dimension='y', **kwargs)
+    assert np.array_equal(hist, hist_32)
+    assert np.allclose(bins, bins_32)
+
+
+def test_histogram_fixed_bins():
+    d = np.random.uniform(-1, 11, size=(300, 40))
+    for kwargs in ({'bins': 7, 'range': (0, 10)},
+                   {'bins': np.array([0, 0.5, 2, 3, 3.1, 9.8, 10.0])}):
+        for time_steps in (None, (5, 5), (10, 250), (-20, -1)):
+            t0, t1 = _check_time_steps(d, time_steps)
+            expected, expected_bins = np.histogram(d[t0], **kwargs)
+            for t in range(t0 + 1, t1):
+                expected = expected + np.histogram(d[t], **kwargs)[0]
+            hist, bins = occamhist(d, time_steps=time_steps, **kwargs)
+            assert np.array_equal(hist, expected)
+            assert np.array_equal(bins, expected_bins)
+            assert hist.dtype == expected.dtype
+
+        # Histograms of chunks of frames add up to the same.
+        hist, _ = _histogram_frames(d, 0, len(d), max_values=100, **kwargs)
+        assert np.array_equal(hist, occamhist(d, **kwargs)[0])
+
+
+def test_density_histogram_by_type():
+    xyz = Xyz(os.path.join(os.path.dirname(fort1_file), 'fort.8'))
+    xyz.read_file(silent=True)
+    # Make every third particle a second type.
+    xyz.type = xyz.type.copy()
+    xyz.type[::3] = 1
+    xyz.type_dict = {'Ar': 0, 'Kr': 1}
+
+    hist, edges = density_histogram(xyz, 'z', bins=6, density=False)
+    assert hist.shape == (2, 6)
+    assert np.allclose(edges[0], np.linspace(0, xyz.box[2], 7))
+    for t in (0, 1):
+        expected, _ = np.histogram(xyz.z[:, xyz.type == t], bins=6,
+                                   range=(0, xyz.box[2]))
+        assert np.array_equal(hist[t], expected)
+
+    # Number densities integrate to the number of particles of each type.
+    hist, edges = density_histogram(xyz, 'xy', bins=(5, 4))
+    assert hist.shape == (2, 5, 4)
+    volume = (np.diff(edges[0])[:, None] * np.diff(edges[1])[None, :]
+              * xyz.box[2])
+    assert np.sum(hist[0] * volume) == pytest.approx(np.sum(xyz.type == 0))
+    assert np.sum(hist[1] * volume) == pytest.approx(np.sum(xyz.type == 1))
+
+
+def test_density_histogram_chunks():
+    data = OccamData(fort1_file, silent=True)
+    hist, edges = density_histogram(data, 'xyz', bins=(4, 3, 2),
+                                    by_type=False, density=False)
+    assert hist.shape == (4, 3, 2)
+    assert hist.sum() == data.x.size
+    for max_values in (1, 60):
+        hist_, _ = density_histogram(data, 'xyz', bins=(4, 3, 2),
+                                     by_type=False, density=False,
+                                     max_values=max_values)
+        assert np.array_equal(hist_, hist)
+    hist_, _ = density_histogram(data.iter_frames(chunk=5), 'xyz',
+                                 bins=(4, 3, 2), by_type=False, density=False)
+    assert np.array_equal(hist_, hist)
+
+    hist, _ = density_histogram(data, 'y', bins=5, time_steps=(2, 6),
+                                range=[(1, 4)])
+    hist_, _ = density_histogram(data.iter_frames(chunk=3), 'y', bins=5,
+                                 time_steps=(2, 6), range=[(1, 4)])
+    assert np.allclose(hist, hist_)
+
+    for dimensions in ('xx', '', 'w'):
+        caught = False
+        try:
+            density_histogram(data, dimensions)
+        except (ValueError, TypeError):
+            caught = True
+        assert caught
+
+
+def test_histogram_accumulator(tmp_path):
+    tmp_path = str(tmp_path)
+    data = OccamData(fort1_file, silent=True)
+    expected, expected_bins = occamhist(data, dimension='z', bins=8,
+                                        range=(0, 5))
+
+    accumulator = HistogramAccumulator(bins=8, range=(0, 5))
+    accumulator.update(data.iter_frames(chunk=5), dimension='z')
+    hist, bins = accumulator.result()
+    assert np.array_equal(hist, expected)
+    assert np.array_equal(bins, expected_bins)
+    assert accumulator.n_frames == len(data.z)
+
+    # Partial accumulators, e.g. from worker processes, merge into one.
+    first = HistogramAccumulator(bins=8, range=(0, 5)).update(data.z[:3])
+    second = HistogramAccumulator(bins=8, range=(0, 5))
+    for frame in data.z[3:]:
+        second.update(frame)
+    second = pickle.loads(pickle.dumps(second))
+    assert np.array_equal(
+        HistogramAccumulator(bins=8, range=(0, 5)).update(
+            ChunkedArray.create(os.path.join(tmp_path, 'z.chunks'),
+                                data.z, chunks=(5, 10))).hist,
+        expected
+    )
+    merged = HistogramAccumulator(bins=8, range=(0, 5)).merge(first, second)
+    assert np.array_equal(merged.hist, expected)
+    assert merged.n_frames == len(data.z)
+
+    caught = False
+    try:
+        merged.merge(HistogramAccumulator(bins=7, range=(0, 5)))
+    except ValueError:
+        caught = True
+    assert caught
+
+    caught = False
+    try:
+        HistogramAccumulator(bins=8)
+    except ValueError:
+        caught = True
+    assert caught
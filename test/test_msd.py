@@ -0,0 +1,82 @@
+import os
+import numpy as np
+from occamtools.occam_data import OccamData
+from occamtools.read_xyz import Xyz
+from occamtools.msd import msd, _unwrap
+from test.helpers import RecordedReads
+
+fort1_file = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir,
+                             'data', 'fort.1'))
+fort8_file = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir,
+                             'data', 'fort.8'))
+
+
+def _naive_msd(positions):
+    n = len(positions[0])
+    return np.array([np.mean(sum((p[m:] - p[:n - m])**2 for p in positions))
+                     for m in range(n)])
+
+
+def test_msd():
+    data = OccamData(fort1_file, silent=True, load_from_npy=False,
+                     save_to_npy=False)
+    positions = [_unwrap(np.asarray(c, dtype=np.float64), b)
+                 for c, b in zip((data.x, data.y, data.z), data.box)]
+    expected = _naive_msd(positions)
+    assert np.allclose(msd(data), expected)
+    assert np.allclose(msd(data, max_values=30), expected)
+    assert np.allclose(msd(data, dimensions='z'), _naive_msd(positions[2:]))
+    assert np.allclose(msd(data, unwrap=False),
+                       _naive_msd([data.x, data.y, data.z]))
+
+
+def test_msd_unwrap():
+    # A particle crossing the periodic boundaries moves in a straight line.
+    xyz = Xyz(fort8_file)
+    xyz.read_file(save=False, silent=True)
+    xyz.type_dict = {'A': 0, 'B': 1}
+    xyz.type = np.array([0, 1, 0])
+    xyz.box = np.array([10.0, 5.0, 5.0])
+    t = np.arange(50)[:, np.newaxis]
+    xyz.x = np.mod(np.array([[1.0, 0.5, -0.7]]) * t, 10.0)
+    xyz.y = np.mod(np.array([[0.0, 2.0, 1.0]]) * t + 4.0, 5.0)
+    xyz.z = np.zeros((50, 3))
+    m = np.arange(50)
+    assert np.allclose(msd(xyz, 'A'), (1.0 + 0.49 + 1.0) / 2 * m**2)
+    assert np.allclose(msd(xyz, 'B', 'y'), 4.0 * m**2)
+
+    caught = False
+    try:
+        msd(xyz, 'C')
+    except ValueError:
+        caught = True
+    assert caught
+
+    xyz.box = [None, None, None]
+    caught = False
+    try:
+        msd(xyz)
+    except ValueError:
+        caught = True
+    assert caught
+
+
+def test_msd_sparse_type():
+    # A minority type spread through the system is read in chunks spanning
+    # at most max_values // n_frames columns.
+    xyz = Xyz(fort8_file)
+    xyz.read_file(save=False, silent=True)
+    rng = np.random.default_rng(2)
+    n_frames, n = 20, 300
+    xyz.box = np.array([10.0, 10.0, 10.0])
+    xyz.x, xyz.y, xyz.z = (rng.uniform(0, 10.0, size=(n_frames, n))
+                           for _ in range(3))
+    xyz.type_dict = {'A': 0, 'B': 1}
+    xyz.type = (np.arange(n) % 37 == 5).astype(float)
+    ids = np.flatnonzero(xyz.type == 1)
+    expected = _naive_msd([_unwrap(c[:, ids], 10.0)
+                           for c in (xyz.x, xyz.y, xyz.z)])
+    xyz.x = RecordedReads(xyz.x)
+    assert np.allclose(msd(xyz, 'B', max_values=20 * 40), expected)
+    assert max(xyz.x.n_columns) <= 40
+    assert len(xyz.x.n_columns) == 4
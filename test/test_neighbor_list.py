@@ -0,0 +1,85 @@
+import os
+import numpy as np
+from occamtools.read_fort1 import Fort1
+from occamtools.neighbor_list import (wrap, minimum_image, neighbor_pairs,
+                                      VerletList)
+
+fort1_file = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir,
+                             'data', 'fort.1'))
+
+
+def _brute_force_pairs(a, b, box, cutoff, same):
+    d = minimum_image(b[np.newaxis] - a[:, np.newaxis], box)
+    r = np.sqrt(np.sum(d**2, axis=-1))
+    close = r < cutoff
+    if same:
+        close = np.triu(close, k=1)
+    i, j = np.nonzero(close)
+    return i, j, r[i, j]
+
+
+def _sorted(i, j, r):
+    order = np.lexsort((j, i))
+    return i[order], j[order], r[order]
+
+
+def test_wrap_minimum_image():
+    box = np.array([10.0, 5.0, 4.0])
+    positions = np.array([[-1.0, 5.0, 9.5], [-1e-20, 2.5, -4.0]])
+    assert np.allclose(wrap(positions, box), [[9.0, 0.0, 1.5],
+                                              [0.0, 2.5, 0.0]])
+    assert np.all(wrap(positions, box) < box)
+    assert np.allclose(minimum_image(np.array([6.0, -3.0, 1.0]), box),
+                       [-4.0, 2.0, 1.0])
+
+
+def test_neighbor_pairs():
+    rng = np.random.default_rng(2)
+    # Boxes with one, two, and several cells along the axes.
+    for box, cutoff in (([10.0, 6.0, 4.0], 1.9), ([20.0, 8.0, 8.0], 1.5),
+                        ([4.0, 4.0, 4.0], 2.0)):
+        box = np.array(box)
+        a = rng.uniform(-box, 2 * box, size=(300, 3))
+        b = rng.uniform(0, box, size=(200, 3))
+        for pairs, expected in (
+                (neighbor_pairs(a, box=box, cutoff=cutoff),
+                 _brute_force_pairs(a, a, box, cutoff, True)),
+                (neighbor_pairs(a, b, box=box, cutoff=cutoff),
+                 _brute_force_pairs(a, b, box, cutoff, False))):
+            for x, y in zip(_sorted(*pairs), expected):
+                assert np.allclose(x, y)
+
+    caught = False
+    try:
+        neighbor_pairs(a, box=[4.0, 4.0, 4.0], cutoff=2.1)
+    except ValueError:
+        caught = True
+    assert caught
+
+
+def test_verlet_list():
+    fort1 = Fort1(fort1_file)
+    fort1.read_file()
+    box = np.array([25.0, 20.0, 20.0])
+    verlet = VerletList.from_fort1(fort1, box=box)
+    assert verlet.cutoff == 8.5
+    assert np.isclose(verlet.skin, 1.0)
+
+    rng = np.random.default_rng(4)
+    positions = rng.uniform(0, box, size=(100, 3))
+    for step in range(10):
+        positions = positions + rng.uniform(-0.05, 0.05, size=(100, 3))
+        pairs = verlet.pairs(positions)
+        expected = _brute_force_pairs(positions, positions, box, 8.5, True)
+        for x, y in zip(pairs, expected):
+            assert np.allclose(x, y)
+    assert verlet.n_builds == 1
+    verlet.pairs(positions + 0.4)
+    assert verlet.n_builds == 2
+
+    caught = False
+    try:
+        VerletList.from_fort1(fort1)
+    except ValueError:
+        caught = True
+    assert caught
@@ -6,6 +6,8 @@ import shutil
 from occamtools.read_fort1 import Fort1
 from occamtools.read_fort7 import Fort7
 from occamtools.read_xyz import Xyz, _are_floats
+from occamtools.chunked_array import ChunkedArray
+from occamtools.histogram import histogram
 from occamtools.occam_data import (OccamData, _check_internal_consistency_all,
                                    _check_internal_consistency)
 
@@ -19,7 +21,8 @@ file_name_fort_xyz = os.path.join(os.path.dirname(__file__), os.pardir, 'data',
 class_dir = os.path.join(os.path.dirname(__file__), os.pardir, 'data',
                          'class_data')
 ignore = ['file_name', 'n_time_steps_', 'file_contents',
-          'comment_format_known', 'num_lines']
+          'comment_format_known', 'num_lines', 'index', 'bytes_read',
+          'observables']
 
 
 def _load_default_forts(silent=True):
@@ -213,6 +216,371 @@ def test_occam_data_progress_bars():
     shutil.rmtree(class_dir)
 
 
+def test_occam_data_iter_frames():
+    occam_data, _, _, xyz = _create_default_occam_data_object()
+    chunks = list(occam_data.iter_frames(chunk=5))
+    assert len(chunks) == 3
+    for key in ('x', 'y', 'z', 'time'):
+        assert np.array_equal(
+            np.concatenate([getattr(c, key) for c in chunks]),
+            getattr(xyz, key)
+        )
+    assert np.shares_memory(chunks[0].x, occam_data.x)
+    assert chunks[0].type_dict == xyz.type_dict
+
+    caught = False
+    try:
+        next(occam_data.iter_frames(chunk=0))
+    except ValueError:
+        caught = True
+    assert caught
+    shutil.rmtree(class_dir, ignore_errors=True)
+
+
+def test_occam_data_dtype():
+    shutil.rmtree(class_dir, ignore_errors=True)
+    _, _, _, xyz = _create_default_occam_data_object()
+    shutil.rmtree(class_dir, ignore_errors=True)
+
+    occam_data = OccamData(file_name_fort_1, silent=True, dtype=np.float32)
+    assert occam_data.dtype == 'float32'
+    assert occam_data.x.dtype == np.float32
+    assert occam_data.type.dtype == np.uint8
+    assert np.load(os.path.join(class_dir, 'y.npy')).dtype == np.float32
+    assert np.allclose(occam_data.x, xyz.x)
+
+    occam_data_npy = OccamData(file_name_fort_1, silent=True)
+    assert occam_data_npy.dtype == 'float32'
+    assert occam_data_npy.z.dtype == np.float32
+    assert np.array_equal(occam_data_npy.z, occam_data.z)
+    shutil.rmtree(class_dir)
+
+    # Data cached as float64 is converted when loaded with another dtype.
+    _ = OccamData(file_name_fort_1, silent=True)
+    occam_data_npy = OccamData(file_name_fort_1, silent=True,
+                               dtype=np.float32)
+    assert occam_data_npy.x.dtype == np.float32
+    assert occam_data_npy.type.dtype == np.uint8
+    assert occam_data_npy.dtype == 'float32'
+    # The cache is rewritten with the new dtype, and stays memory-mapped.
+    assert isinstance(occam_data_npy.x, np.memmap)
+    assert np.load(os.path.join(class_dir, 'x.npy')).dtype == np.float32
+    occam_data_npy = OccamData(file_name_fort_1, silent=True)
+    assert occam_data_npy.dtype == 'float32'
+    assert occam_data_npy.y.dtype == np.float32
+    assert np.allclose(occam_data_npy.x, xyz.x)
+    shutil.rmtree(class_dir)
+
+    # Without saving, the arrays are converted in memory and the cache is
+    # left as is.
+    _ = OccamData(file_name_fort_1, silent=True)
+    occam_data_npy = OccamData(file_name_fort_1, silent=True,
+                               dtype=np.float32, save_to_npy=False)
+    assert occam_data_npy.x.dtype == np.float32
+    assert np.load(os.path.join(class_dir, 'x.npy')).dtype == np.float64
+    assert OccamData(file_name_fort_1, silent=True).x.dtype == np.float64
+    shutil.rmtree(class_dir)
+
+    # Chunked arrays are converted chunk by chunk.
+    _ = OccamData(file_name_fort_1, silent=True, storage='chunked')
+    occam_data_npy = OccamData(file_name_fort_1, silent=True,
+                               dtype=np.float32)
+    assert isinstance(occam_data_npy.x, ChunkedArray)
+    assert occam_data_npy.x.dtype == np.float32
+    assert np.allclose(occam_data_npy.x[...], xyz.x)
+    assert OccamData(file_name_fort_1, silent=True).y.dtype == np.float32
+    shutil.rmtree(class_dir)
+
+
+def test_occam_data_mmap():
+    shutil.rmtree(class_dir, ignore_errors=True)
+    _, _, _, xyz = _create_default_occam_data_object()
+    occam_data = OccamData(file_name_fort_1, silent=True)
+    for key in ('x', 'y', 'z', 'time', 'kinetic_energy'):
+        assert isinstance(getattr(occam_data, key), np.memmap)
+        assert getattr(occam_data, key).mode == 'r'
+    assert np.array_equal(occam_data.x, xyz.x)
+
+    occam_data_eager = OccamData(file_name_fort_1, silent=True,
+                                 mmap_mode=None)
+    assert not isinstance(occam_data_eager.x, np.memmap)
+    assert np.array_equal(occam_data_eager.x, xyz.x)
+
+    # Overwriting the cache of a memory-mapped object keeps both the object
+    # and previously held references to its arrays valid.
+    x_before = occam_data.x
+    assert occam_data.save(overwrite=True)
+    assert np.array_equal(x_before, xyz.x)
+    assert np.array_equal(occam_data.x, xyz.x)
+
+    occam_data_copy = OccamData(file_name_fort_1, silent=True, mmap_mode='c')
+    occam_data_copy.y[0, 0] = -1.0
+    x_before = occam_data.x
+    occam_data_copy.save(overwrite=True)
+    assert np.load(os.path.join(class_dir, 'y.npy'))[0, 0] == -1.0
+    assert np.array_equal(x_before, xyz.x)
+    shutil.rmtree(class_dir)
+
+
+def _copy_default_run(run_dir):
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.mkdir(run_dir)
+    for f in (file_name_fort_1, file_name_fort_7, file_name_fort_xyz):
+        shutil.copy(f, run_dir)
+    return run_dir
+
+
+def test_occam_data_cache_invalidation():
+    run_dir = _copy_default_run(os.path.join(os.path.dirname(__file__),
+                                             'cache_run'))
+    run_class_dir = os.path.join(run_dir, 'class_data')
+    fort7_file = os.path.join(run_dir, 'fort.7')
+    xyz_file = os.path.join(run_dir, 'fort.8')
+    occam_data = OccamData(run_dir, silent=True)
+    assert set(occam_data.source_fingerprints) == {'fort1', 'fort7', 'xyz'}
+    x_npy = os.path.join(run_class_dir, 'x.npy')
+    x_mtime = os.stat(x_npy).st_mtime_ns
+
+    # Only the changed fort.7 is read again, the trajectory is kept.
+    with open(fort7_file, 'r') as in_file:
+        contents = in_file.readlines()
+    end = [i for i, line in enumerate(contents) if 'step no.' in line][-2]
+    with open(fort7_file, 'w') as out_file:
+        out_file.writelines(contents[:end])
+    occam_data = OccamData(run_dir, silent=True)
+    assert occam_data.step.shape[0] == 10
+    assert os.stat(x_npy).st_mtime_ns == x_mtime
+    occam_data = OccamData(run_dir, silent=True)
+    assert occam_data.step.shape[0] == 10
+    assert np.load(os.path.join(run_class_dir, 'step.npy')).shape[0] == 10
+
+    with open(xyz_file, 'r') as in_file:
+        contents = in_file.readlines()
+    with open(xyz_file, 'w') as out_file:
+        out_file.writelines(contents[:-27])
+    occam_data = OccamData(run_dir, silent=True)
+    assert occam_data.x.shape == (11, 25)
+    assert occam_data.step.shape[0] == 10
+
+    # Removed source files do not invalidate the cache.
+    os.remove(xyz_file)
+    occam_data = OccamData(run_dir, silent=True)
+    assert occam_data.x.shape == (11, 25)
+    shutil.rmtree(run_dir)
+
+
+def test_occam_data_cache_content_hash():
+    run_dir = _copy_default_run(os.path.join(os.path.dirname(__file__),
+                                             'hash_run'))
+    fort7_file = os.path.join(run_dir, 'fort.7')
+    occam_data = OccamData(run_dir, silent=True, content_hash=True)
+    kinetic_energy = occam_data.kinetic_energy[-1]
+    assert occam_data.source_fingerprints['fort7']['hash'] is not None
+
+    # Same size, same modification time, different contents.
+    stat = os.stat(fort7_file)
+    with open(fort7_file, 'r') as in_file:
+        contents = in_file.read()
+    contents = contents.replace('30.761054436014966      ekin',
+                                '31.761054436014966      ekin')
+    with open(fort7_file, 'w') as out_file:
+        out_file.write(contents)
+    os.utime(fort7_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    occam_data = OccamData(run_dir, silent=True)
+    assert occam_data.kinetic_energy[-1] == kinetic_energy
+    occam_data = OccamData(run_dir, silent=True, content_hash=True)
+    assert occam_data.kinetic_energy[-1] == pytest.approx(
+        31.761054436014966, abs=1e-12
+    )
+
+    # Touching a file without changing it does not invalidate the cache
+    # when hashes are compared.
+    os.utime(fort7_file)
+    occam_data = OccamData(run_dir, silent=True, content_hash=True)
+    assert not occam_data._changed_sources(
+        os.path.join(run_dir, 'class_data'), content_hash=True
+    )
+    shutil.rmtree(run_dir)
+
+
+def _split_file(file_name, n_lines):
+    with open(file_name, 'r') as in_file:
+        contents = in_file.readlines()
+    with open(file_name, 'w') as out_file:
+        out_file.writelines(contents[:n_lines])
+    return contents[n_lines:]
+
+
+def _append_file(file_name, contents):
+    with open(file_name, 'a') as out_file:
+        out_file.writelines(contents)
+
+
+def test_occam_data_refresh():
+    full = OccamData(file_name_fort_1, save_to_npy=False, load_from_npy=False,
+                     silent=True)
+    run_dir = _copy_default_run(os.path.join(os.path.dirname(__file__),
+                                             'append_run'))
+    run_class_dir = os.path.join(run_dir, 'class_data')
+    fort7_file = os.path.join(run_dir, 'fort.7')
+    xyz_file = os.path.join(run_dir, 'fort.8')
+    fort7_rest = _split_file(fort7_file, 623)
+    xyz_rest = _split_file(xyz_file, 5 * 27)
+
+    occam_data = OccamData(run_dir, silent=True)
+    assert occam_data.step.shape[0] == 2
+    assert occam_data.x.shape == (5, 25)
+    assert not occam_data.refresh(silent=True)
+
+    # Appended frames and step blocks are read on their own and appended to
+    # the .npy files in place.
+    _append_file(xyz_file, xyz_rest[:3 * 27])
+    _append_file(fort7_file, fort7_rest[:36])
+    x_npy = os.path.join(run_class_dir, 'x.npy')
+    x_inode = os.stat(x_npy).st_ino
+    assert occam_data.refresh(silent=True)
+    assert os.stat(x_npy).st_ino == x_inode
+    assert isinstance(occam_data.x, np.memmap)
+    assert occam_data.x.shape == (8, 25)
+    assert occam_data.step.shape[0] == 3
+    assert np.load(x_npy).shape == (8, 25)
+
+    # The rest is picked up when the data is loaded from the .npy files.
+    _append_file(xyz_file, xyz_rest[3 * 27:])
+    _append_file(fort7_file, fort7_rest[36:])
+    occam_data = OccamData(run_dir, silent=True)
+    assert os.stat(x_npy).st_ino == x_inode
+    for key in ('time', 'x', 'y', 'z', 'step',
+                'kinetic_energy', 'pressure_pf_1'):
+        assert np.array_equal(getattr(occam_data, key), getattr(full, key))
+
+    # Rewritten files are read again in full.
+    with open(xyz_file, 'r') as in_file:
+        contents = in_file.readlines()
+    contents[2] = contents[2].replace('1', '2', 1)
+    with open(xyz_file, 'w') as out_file:
+        out_file.writelines(contents[:-27] + contents[:27])
+    occam_data = OccamData(run_dir, silent=True)
+    assert occam_data.x.shape == full.x.shape
+    assert occam_data.x[0, 0] != full.x[0, 0]
+    assert occam_data.x[-1, 0] == occam_data.x[0, 0]
+    shutil.rmtree(run_dir)
+
+
+def test_occam_data_refresh_dtype():
+    full = OccamData(file_name_fort_1, save_to_npy=False, load_from_npy=False,
+                     silent=True)
+    run_dir = _copy_default_run(os.path.join(os.path.dirname(__file__),
+                                             'append_dtype_run'))
+    x_npy = os.path.join(run_dir, 'class_data', 'x.npy')
+    xyz_file = os.path.join(run_dir, 'fort.8')
+    xyz_rest = _split_file(xyz_file, 5 * 27)
+    _ = OccamData(run_dir, silent=True)
+
+    # Converted without saving, frames are appended to the float64 cache,
+    # and to the float32 arrays in memory.
+    occam_data = OccamData(run_dir, silent=True, dtype=np.float32,
+                           save_to_npy=False)
+    _append_file(xyz_file, xyz_rest[:3 * 27])
+    assert occam_data.refresh(silent=True)
+    assert occam_data.x.dtype == np.float32
+    assert occam_data.x.shape == (8, 25)
+    assert np.load(x_npy).dtype == np.float64
+    occam_data = OccamData(run_dir, silent=True)
+    assert occam_data.dtype is None or occam_data.dtype == 'float64'
+    assert occam_data.x.dtype == np.float64
+    assert np.array_equal(occam_data.x, full.x[:8])
+
+    # Converted with saving, the whole cache is float32.
+    occam_data = OccamData(run_dir, silent=True, dtype=np.float32)
+    _append_file(xyz_file, xyz_rest[3 * 27:])
+    assert occam_data.refresh(silent=True)
+    assert occam_data.x.dtype == np.float32
+    assert isinstance(occam_data.x, np.memmap)
+    assert np.load(x_npy).dtype == np.float32
+    for dtype in (None, np.float32):
+        occam_data = OccamData(run_dir, silent=True, dtype=dtype)
+        assert occam_data.dtype == 'float32'
+        assert occam_data.x.dtype == np.float32
+        assert np.allclose(occam_data.x, full.x)
+    shutil.rmtree(run_dir)
+
+
+def test_occam_data_stream_chunk():
+    full = OccamData(file_name_fort_1, save_to_npy=False, load_from_npy=False,
+                     silent=True)
+    run_dir = _copy_default_run(os.path.join(os.path.dirname(__file__),
+                                             'stream_run'))
+    run_class_dir = os.path.join(run_dir, 'class_data')
+    xyz_file = os.path.join(run_dir, 'fort.8')
+    xyz_rest = _split_file(xyz_file, 10 * 27)
+    read_file = Xyz.read_file
+
+    def fail(*args, **kwargs):
+        raise AssertionError('fort.8 read in full')
+
+    # The cache is built from chunks of frames, without reading fort.8 in
+    # full, and followed by refresh as usual.
+    Xyz.read_file = fail
+    try:
+        occam_data = OccamData(run_dir, silent=True, stream_chunk=3)
+    finally:
+        Xyz.read_file = read_file
+    assert isinstance(occam_data.x, np.memmap)
+    assert np.load(os.path.join(run_class_dir, 'x.npy')).shape == (10, 25)
+    for key in ('time', 'x', 'y', 'z'):
+        assert np.array_equal(getattr(occam_data, key),
+                              getattr(full, key)[:10])
+    assert np.array_equal(occam_data.type, full.type)
+    assert occam_data.type_dict == full.type_dict
+    _append_file(xyz_file, xyz_rest)
+    assert occam_data.refresh(silent=True)
+    assert np.array_equal(occam_data.x, full.x)
+    shutil.rmtree(run_class_dir)
+
+    occam_data = OccamData(run_dir, silent=True, stream_chunk=4,
+                           storage='chunked', precision=1e-3)
+    assert isinstance(occam_data.x, ChunkedArray)
+    assert np.max(np.abs(occam_data.x[...] - full.x)) <= 0.5e-3 + 1e-12
+    assert np.array_equal(occam_data.time[...], full.time)
+    occam_data = OccamData(run_dir, silent=True)
+    assert occam_data.x.shape == full.x.shape
+    shutil.rmtree(run_dir)
+
+
+def test_occam_data_chunked_storage():
+    full = OccamData(file_name_fort_1, save_to_npy=False, load_from_npy=False,
+                     silent=True)
+    run_dir = _copy_default_run(os.path.join(os.path.dirname(__file__),
+                                             'chunked_run'))
+    run_class_dir = os.path.join(run_dir, 'class_data')
+    occam_data = OccamData(run_dir, silent=True, storage='chunked')
+    assert isinstance(occam_data.x, ChunkedArray)
+    assert os.path.isdir(os.path.join(run_class_dir, 'x.chunks'))
+    assert not os.path.exists(os.path.join(run_class_dir, 'x.npy'))
+
+    occam_data = OccamData(run_dir, silent=True)
+    assert occam_data.storage == 'chunked'
+    for key in ('time', 'x', 'y', 'z', 'type', 'step', 'kinetic_energy'):
+        assert np.array_equal(getattr(occam_data, key)[...],
+                              getattr(full, key))
+    assert np.array_equal(occam_data.x[3:7, 10], full.x[3:7, 10])
+    hist, _ = histogram(occam_data, dimension='y', bins=5)
+    hist_full, _ = histogram(full, dimension='y', bins=5)
+    assert np.array_equal(hist, hist_full)
+
+    occam_data = OccamData(run_dir, silent=True, storage='chunked',
+                           precision=1e-3)
+    assert np.max(np.abs(occam_data.x[...] - full.x)) <= 0.5e-3 + 1e-12
+    assert np.array_equal(occam_data.step[...], full.step)
+
+    # Converting back to .npy files removes the chunks.
+    occam_data = OccamData(run_dir, silent=True, storage='npy')
+    assert isinstance(occam_data.x, np.memmap)
+    assert not os.path.exists(os.path.join(run_class_dir, 'x.chunks'))
+    shutil.rmtree(run_dir)
+
+
 def test_occam_data_not_save_to_npy():
     assert not os.path.exists(class_dir)
     _ = OccamData(file_name_fort_1, save_to_npy=False, silent=True)
@@ -0,0 +1,76 @@
+import os
+import shutil
+import numpy as np
+from occamtools.occam_data import OccamData
+from occamtools.occam_ensemble import OccamEnsemble
+
+data_dir = os.path.join(os.path.dirname(__file__), os.pardir, 'data')
+ensemble_dir = os.path.join(os.path.dirname(__file__), 'ensemble')
+
+
+def _create_runs(n_runs):
+    shutil.rmtree(ensemble_dir, ignore_errors=True)
+    run_dirs = []
+    for i in range(n_runs):
+        run_dir = os.path.join(ensemble_dir, f'run_{i}')
+        os.makedirs(run_dir)
+        for f in ('fort.1', 'fort.7', 'fort.8'):
+            shutil.copy(os.path.join(data_dir, f), run_dir)
+        run_dirs.append(run_dir)
+    return run_dirs
+
+
+def test_occam_ensemble_stack():
+    run_dirs = _create_runs(3)
+    single = OccamData(run_dirs[0], save_to_npy=False, load_from_npy=False,
+                       silent=True)
+    for workers in (1, 2):
+        ensemble = OccamEnsemble(run_dirs, workers=workers, silent=True)
+        assert len(ensemble) == 3
+        assert ensemble.kinetic_energy.shape == (3, 11)
+        assert ensemble.x.shape == (3, 12, 25)
+        for energy in ensemble.stack('kinetic_energy'):
+            assert np.array_equal(energy, single.kinetic_energy)
+        assert np.array_equal(ensemble.n_particles, [25, 25, 25])
+        for run_dir in run_dirs:
+            assert os.path.exists(os.path.join(run_dir, 'class_data'))
+
+    ensemble = OccamEnsemble(os.path.join(ensemble_dir, 'run_*'),
+                             save_to_npy=False, workers=2, silent=True)
+    assert ensemble.run_dirs == run_dirs
+    assert isinstance(ensemble[1], OccamData)
+    shutil.rmtree(ensemble_dir)
+
+
+def test_occam_ensemble_different_lengths():
+    run_dirs = _create_runs(2)
+    fort8 = os.path.join(run_dirs[1], 'fort.8')
+    with open(fort8, 'r') as in_file:
+        contents = in_file.readlines()
+    with open(fort8, 'w') as out_file:
+        out_file.writelines(contents[:-2 * 27])
+    ensemble = OccamEnsemble(run_dirs, workers=1, silent=True)
+
+    caught = False
+    try:
+        ensemble.x
+    except ValueError:
+        caught = True
+    assert caught
+    assert ensemble.stack('x', truncate=True).shape == (2, 10, 25)
+    assert ensemble.stack('kinetic_energy').shape == (2, 11)
+
+    caught = False
+    try:
+        ensemble.not_an_attribute
+    except AttributeError:
+        caught = True
+    assert caught
+
+    caught = False
+    try:
+        OccamEnsemble(os.path.join(ensemble_dir, 'no_runs_*'), silent=True)
+    except ValueError:
+        caught = True
+    assert caught
+    shutil.rmtree(ensemble_dir)
@@ -0,0 +1,99 @@
+import os
+import numpy as np
+from occamtools.occam_data import OccamData
+from occamtools.read_xyz import Xyz
+from occamtools.rdf import rdf
+
+fort1_file = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir,
+                             'data', 'fort.1'))
+fort8_file = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir,
+                             'data', 'fort.8'))
+
+
+def _brute_force_rdf(data, ids_a, ids_b, r_max, bins):
+    box = np.asarray(data.box)
+    hist = np.zeros(bins)
+    for t in range(len(data.x)):
+        pos = np.stack((data.x[t], data.y[t], data.z[t]), axis=1)
+        d = pos[ids_a][:, np.newaxis] - pos[ids_b][np.newaxis]
+        d -= box * np.round(d / box)
+        r = np.sqrt(np.sum(d**2, axis=-1))
+        r = r[ids_a[:, np.newaxis] != ids_b[np.newaxis]]
+        hist += np.histogram(r, bins=bins, range=(0, r_max))[0]
+    n_pairs = len(ids_a) * len(ids_b) - len(np.intersect1d(ids_a, ids_b))
+    edges = np.linspace(0, r_max, bins + 1)
+    shell = 4 * np.pi / 3 * (edges[1:]**3 - edges[:-1]**3)
+    return hist / (len(data.x) * n_pairs / np.prod(box) * shell)
+
+
+def test_rdf():
+    data = OccamData(fort1_file, silent=True, load_from_npy=False,
+                     save_to_npy=False)
+    g, edges = rdf(data, bins=10)
+    assert np.allclose(edges, np.linspace(0, 2.5, 11))
+    ids = np.arange(data.n_particles)
+    assert np.allclose(g, _brute_force_rdf(data, ids, ids, 2.5, 10))
+
+    g, _ = rdf(data, r_max=2.0, bins=5, frames=slice(2, 7), workers=2,
+               frames_per_task=2)
+    data.x, data.y, data.z = data.x[2:7], data.y[2:7], data.z[2:7]
+    assert np.allclose(g, _brute_force_rdf(data, ids, ids, 2.0, 5))
+
+
+def test_rdf_parallel():
+    # More tasks than the 2 * workers kept in flight at a time.
+    data = OccamData(fort1_file, silent=True, load_from_npy=False,
+                     save_to_npy=False)
+    assert len(data.x) > 4
+    g, _ = rdf(data, bins=10, frames_per_task=1)
+    g_parallel, _ = rdf(data, bins=10, workers=2, frames_per_task=1)
+    assert np.allclose(g, g_parallel)
+
+
+def test_rdf_types():
+    xyz = Xyz(fort8_file)
+    xyz.read_file(save=False, silent=True)
+    xyz.type_dict = {'A': 0, 'B': 1}
+    xyz.type = np.arange(xyz.n_particles) % 3 == 0
+    ids_a = np.flatnonzero(xyz.type == 0)
+    ids_b = np.flatnonzero(xyz.type == 1)
+    for type_a, type_b, a, b in (('A', 'B', ids_a, ids_b),
+                                 ('B', 'B', ids_b, ids_b),
+                                 (None, 'A', np.arange(xyz.n_particles),
+                                  ids_a)):
+        g, _ = rdf(xyz, type_a, type_b, bins=8)
+        assert np.allclose(g, _brute_force_rdf(xyz, a, b, 2.5, 8))
+
+
+def test_rdf_ideal_gas():
+    # Uniformly random positions have g(r) = 1 on average.
+    xyz = Xyz(fort8_file)
+    xyz.read_file(save=False, silent=True)
+    rng = np.random.default_rng(1)
+    n = 20000
+    xyz.box = np.array([30.0, 20.0, 25.0])
+    xyz.x, xyz.y, xyz.z = (rng.uniform(-b, 2 * b, size=(1, n))
+                           for b in xyz.box)
+    xyz.type = np.zeros(n)
+    g, _ = rdf(xyz, r_max=4.0, bins=4)
+    assert np.allclose(g, 1, atol=0.05)
+
+
+def test_rdf_errors():
+    data = OccamData(fort1_file, silent=True, load_from_npy=False,
+                     save_to_npy=False)
+    for kwargs in ({'r_max': 2.6}, {'r_max': 0}, {'type_a': 'Ne'},
+                   {'frames': slice(20, 30)}):
+        caught = False
+        try:
+            rdf(data, **kwargs)
+        except ValueError:
+            caught = True
+        assert caught
+
+    caught = False
+    try:
+        rdf(data.x)
+    except TypeError:
+        caught = True
+    assert caught
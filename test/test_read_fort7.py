@@ -1,5 +1,6 @@
 import os
 import pytest
+import numpy as np
 from occamtools.read_fort7 import Fort7
 
 
@@ -45,3 +46,163 @@ def test_read_fort7_values():
             == pytest.approx(-30.651382977837372, abs=1e-15))
     expected = [1, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100]
     assert all([s == e for s, e in zip(fort7.step, expected)])
+
+
+def test_read_fort7_truncated():
+    fort7, file_name = _load_example_fort7()
+    truncated_file = os.path.join(os.path.dirname(__file__), 'truncated.7')
+    with open(file_name, 'r') as in_file:
+        contents = in_file.readlines()
+    end = [i for i, line in enumerate(contents) if 'step no.' in line][-2]
+    with open(truncated_file, 'w') as out_file:
+        out_file.writelines(contents[:end + 5])
+    truncated = Fort7(truncated_file)
+    truncated.read_file(silent=True)
+    assert truncated.step.shape[0] == 10
+    assert truncated.step[-1] == 90
+    assert (truncated.kinetic_energy[2]
+            == pytest.approx(fort7.kinetic_energy[2], abs=1e-15))
+
+    with open(truncated_file, 'w') as out_file:
+        out_file.writelines(contents[:20])
+    caught = False
+    try:
+        Fort7(truncated_file).read_file(silent=True)
+    except ValueError:
+        caught = True
+    assert caught
+    os.remove(truncated_file)
+
+
+def test_read_fort7_all_quantities():
+    fort7, _ = _load_example_fort7()
+    assert len(fort7.observable_names) == 36
+    for name in fort7.observable_names:
+        assert getattr(fort7, name).shape == (11,)
+        assert np.array_equal(getattr(fort7, name), fort7.observables[name])
+    assert (fort7.total_energy[-1]
+            == pytest.approx(156713618.29018384, abs=1e-6))
+    assert fort7.density[3] == pytest.approx(6.6389408690000016, abs=1e-15)
+    assert (fort7.pressure_pf_1[-1]
+            == pytest.approx(-0.14253895618857493, abs=1e-15))
+    assert (fort7.pressure_pf_1_zz[-1]
+            == pytest.approx(-0.11036390898713896, abs=1e-15))
+    assert (fort7.nonbonded_virial[0]
+            == pytest.approx(5269.7330411433104, abs=1e-12))
+
+
+def test_read_fort7_irregular_blocks():
+    fort7, file_name = _load_example_fort7()
+    irregular_file = os.path.join(os.path.dirname(__file__), 'irregular.7')
+    with open(file_name, 'r') as in_file:
+        contents = in_file.readlines()
+
+    # A block missing a line, and one with a message in it, are parsed line
+    # by line.
+    steps = [i for i, line in enumerate(contents) if 'step no.' in line]
+    assert 'ekin' in contents[steps[4] + 19]
+    del contents[steps[4] + 19]
+    contents.insert(steps[7] + 1, ' neighbour list updated\n')
+    with open(irregular_file, 'w') as out_file:
+        out_file.writelines(contents)
+    for chunk_size in (2**10, 2**26):
+        irregular = Fort7(irregular_file)
+        irregular.chunk_size = chunk_size
+        irregular.read_file(silent=True)
+        assert irregular.observable_names == fort7.observable_names
+        for name in fort7.observable_names:
+            if name != 'kinetic_energy':
+                assert np.array_equal(getattr(irregular, name),
+                                      getattr(fort7, name))
+        assert irregular.kinetic_energy[4] == 0.0
+        assert irregular.kinetic_energy[5] == fort7.kinetic_energy[5]
+    os.remove(irregular_file)
+
+
+def test_read_fort7_new_observables():
+    fort7, file_name = _load_example_fort7()
+    new_file = os.path.join(os.path.dirname(__file__), 'new_observable.7')
+    with open(file_name, 'r') as in_file:
+        contents = in_file.readlines()
+
+    # Labels not known to Fort7 are picked up as observables named after
+    # the label.
+    new_contents = []
+    for line in contents:
+        new_contents.append(line)
+        if line.endswith('dens\n'):
+            step = line.split()[0]
+            new_contents.append(f'{step:>12}   {step}.5      PF_press_2  \n')
+    with open(new_file, 'w') as out_file:
+        out_file.writelines(new_contents)
+    new = Fort7(new_file)
+    new.read_file(silent=True)
+    assert new.observable_names[-4] == 'pf_press_2'
+    assert len(new.observables) == 11
+    assert np.array_equal(new.pf_press_2, new.step + 0.5)
+    assert np.array_equal(new.density, fort7.density)
+
+    # The end of the blocks is taken from the first block, so the only block
+    # of a simulation still running is complete once the next one starts.
+    # Blocks appended later are complete once their last line is written.
+    steps = [i for i, line in enumerate(new_contents) if 'step no.' in line]
+    for n_lines, n_blocks in ((steps[1], 0), (steps[1] + 1, 1),
+                              (steps[2], 2), (steps[2] - 1, 1)):
+        with open(new_file, 'w') as out_file:
+            out_file.writelines(new_contents[:n_lines])
+        new = Fort7(new_file)
+        new.read_file(silent=True)
+        assert len(new.observables) == n_blocks
+        assert new.block_end == (None if n_blocks == 0 else 'nonbonded virial')
+
+    # Blocks ending with another label than those written by OCCAM.
+    contents = [line for line in new_contents
+                if not line.endswith('nonbonded virial\n')]
+    steps = [i for i, line in enumerate(contents) if 'step no.' in line]
+    with open(new_file, 'w') as out_file:
+        out_file.writelines(contents[:steps[1] + 1])
+    new = Fort7(new_file)
+    new.read_file(silent=True)
+    assert new.block_end == 'angle virial'
+    with open(new_file, 'w') as out_file:
+        out_file.writelines(contents[:steps[2]])
+    appended = Fort7(new_file)
+    appended.block_end = new.block_end
+    assert appended.read_appended(new.bytes_read) == 1
+    assert appended.pf_press_2[0] == 10.5
+    os.remove(new_file)
+
+
+def test_read_fort7_final_averages():
+    fort7, file_name = _load_example_fort7()
+    assert fort7.final_step == 100
+    assert len(fort7.final_averages) == 7
+    assert (fort7.average_pressure
+            == pytest.approx(4436262766.6843357, abs=1e-6))
+    assert (fort7.average_pressure_pf_1_zz
+            == pytest.approx(-1.1537707869206673E-002, abs=1e-15))
+    assert fort7.final_averages['average_pressure_nb'] == pytest.approx(
+        4436262754.0513592, abs=1e-6
+    )
+
+    # Only the header and the final averages are read in summary mode.
+    summary = Fort7(file_name)
+    summary.read_file(silent=True, summary_only=True)
+    assert summary.final_averages == fort7.final_averages
+    assert summary.final_step == fort7.final_step
+    assert summary.n_particles == fort7.n_particles
+    assert not hasattr(summary, 'step')
+
+    # A run which did not finish has no final averages.
+    truncated_file = os.path.join(os.path.dirname(__file__), 'truncated.7')
+    with open(file_name, 'r') as in_file:
+        contents = in_file.readlines()
+    end = [i for i, line in enumerate(contents) if 'step no.' in line][-2]
+    with open(truncated_file, 'w') as out_file:
+        out_file.writelines(contents[:end])
+    for summary_only in (False, True):
+        truncated = Fort7(truncated_file)
+        truncated.read_file(silent=True, summary_only=summary_only)
+        assert truncated.final_averages == {}
+        assert not hasattr(truncated, 'average_pressure')
+    os.remove(truncated_file)
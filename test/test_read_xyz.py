@@ -1,7 +1,9 @@
 import os
+import shutil
 import pytest
 import numpy as np
-from occamtools.read_xyz import Xyz, _are_floats
+from occamtools.read_xyz import (Xyz, XyzIndex, _are_floats, _parse_frame,
+                                 _parse_fixed_width)
 
 file_name = os.path.join(os.path.dirname(__file__), os.pardir, 'data',
                          'example_fort.8')
@@ -124,3 +126,316 @@ def test_read_xyz_velocities():
     assert xyz.vx.shape == xyz.x.shape
     assert xyz.vy.shape == xyz.y.shape
     assert xyz.vz.shape == xyz.z.shape
+
+
+def test_read_xyz_parse_frame():
+    lines = ['Ar   1.5   2.5   3.5\n',
+             'C   -0.25  1e-3  7\n']
+    values = _parse_frame(lines, 4)
+    assert values.shape == (2, 3)
+    assert np.allclose(values, [[1.5, 2.5, 3.5], [-0.25, 1e-3, 7.0]])
+
+    values = _parse_frame(lines[:1], 4)
+    assert values.shape == (1, 3)
+
+    lines = ['Ar 1.0 2.0 3.0 4.0 5.0 6.0\n']
+    values = _parse_frame(lines, 7)
+    assert np.allclose(values, [[1.0, 2.0, 3.0, 4.0, 5.0, 6.0]])
+
+
+def test_read_xyz_parse_fixed_width():
+    lines = ['Ar      1.5000000000     -2.2500000000   -120.0000000000\n',
+             'C    -123.0000000123      0.0000000007     -0.0000000000\n',
+             'Ar     +7.1234567891  12345.6789012345      0.1000000000\n']
+    block = ''.join(lines).encode()
+    values = _parse_fixed_width(block, 3, 3)
+    expected = _parse_frame(lines, 4)
+    assert np.array_equal(values, expected)
+    assert np.array_equal(np.signbit(values), np.signbit(expected))
+    assert _parse_fixed_width(b'', 0, 3).shape == (0, 3)
+
+    # Lines not laid out in fixed columns are left to _parse_frame.
+    irregular = [lines[:2] + ['Ar  1.5  2.5  3.5\n'],
+                 lines[:2] + ['Ar      1.5000000000     -2.2500000000   '
+                              '-1.2000000000e2\n'],
+                 lines[:2] + ['Ar      1.5000000000     -2.25000000000  '
+                              '-120.0000000000\n'],
+                 lines[:2] + ['Ar      1.5000000000     -2.2500000000   '
+                              '-120.00000-0000\n'],
+                 lines[:2] + ['Ar      1.5000000000     -2.25 0000000   '
+                              '-120.0000000000\n'],
+                 lines[:2] + ['Ar      1.5000000000     -2.2500000000   '
+                              '-120.0000000000 1\n'],
+                 [lines[0], lines[1], lines[2][:-1] + ' ']]
+    for other in irregular:
+        assert _parse_fixed_width(''.join(other).encode(), 3, 3) is None
+    # Values of more than 15 significant digits.
+    values = _parse_fixed_width(b'Ar 12345.0000000001\n', 1, 1)
+    assert values[0, 0] == 12345.0000000001
+    assert _parse_fixed_width(b'Ar 123456789.0000000001\n', 1, 1) is None
+
+
+def test_read_xyz_small_chunks():
+    expected = _read_default_file_name()
+    for chunk_size in (100, 2**10):
+        xyz = Xyz(file_name)
+        xyz.chunk_size = chunk_size
+        xyz.read_file(silent=True)
+        assert np.array_equal(xyz.x, expected.x)
+        assert np.array_equal(xyz.z, expected.z)
+        assert np.array_equal(xyz.time, expected.time)
+        assert xyz.bytes_read == os.path.getsize(file_name)
+
+
+def test_read_xyz_truncated_final_frame():
+    truncated_file = os.path.join(os.path.dirname(__file__),
+                                  'truncated_fort.8')
+    with open(file_name, 'r') as in_file:
+        contents = in_file.read()
+    for cut in (1, 5, 30, 300):
+        with open(truncated_file, 'w') as out_file:
+            out_file.write(contents[:-cut])
+        xyz = Xyz(truncated_file)
+        with pytest.warns(UserWarning, match='truncated'):
+            xyz.read_file(silent=True)
+        assert xyz.x.shape == (11, 25)
+        assert xyz.time.shape == (11,)
+        assert xyz.time[10] == pytest.approx(2.7, abs=1e-9)
+    os.remove(truncated_file)
+
+
+def test_read_xyz_grow_arrays():
+    # A long first comment line makes the frame count estimated from the
+    # first frame too small, forcing the arrays to be grown while reading.
+    padded_file = os.path.join(os.path.dirname(__file__), 'padded_fort.8')
+    with open(file_name, 'r') as in_file:
+        contents = in_file.readlines()
+    contents[1] = contents[1].rstrip('\n') + ' ' * 5000 + '\n'
+    with open(padded_file, 'w') as out_file:
+        out_file.writelines(contents)
+    xyz = Xyz(padded_file)
+    sizes = []
+    resize_arrays = xyz._resize_arrays
+
+    def record_resize(n_time_steps):
+        sizes.append(n_time_steps)
+        resize_arrays(n_time_steps)
+
+    xyz._resize_arrays = record_resize
+    xyz.read_file(silent=True)
+    expected = _read_default_file_name()
+    # The arrays are grown to the frames estimated from the rest of the
+    # file, not doubled past the number of frames.
+    assert sizes and max(sizes) <= 13
+    assert xyz.x.shape == (12, 25)
+    assert np.array_equal(xyz.x, expected.x)
+    assert np.array_equal(xyz.z, expected.z)
+    assert np.array_equal(xyz.time, expected.time)
+    os.remove(padded_file)
+
+
+def test_read_xyz_build_index():
+    xyz = Xyz(file_name)
+    index = xyz.build_index(save=False)
+    assert index.n_frames == 12
+    assert index.n_particles == 25
+    assert index.offsets[0] == 0
+    assert index.offsets[-1] == os.path.getsize(file_name)
+    assert not os.path.exists(index.index_file_name)
+
+    small_chunks = XyzIndex(file_name).build(chunk_size=100)
+    assert np.array_equal(small_chunks.offsets, index.offsets)
+
+
+def test_read_xyz_index_persisted():
+    copied_file = os.path.join(os.path.dirname(__file__), 'indexed_fort.8')
+    with open(file_name, 'r') as in_file, open(copied_file, 'w') as out_file:
+        contents = in_file.read()
+        out_file.write(contents)
+    xyz = Xyz(copied_file)
+    index = xyz.build_index()
+    assert os.path.exists(index.index_file_name)
+
+    loaded = XyzIndex(copied_file)
+    assert loaded.load()
+    assert np.array_equal(loaded.offsets, index.offsets)
+
+    # A changed file invalidates the persisted index, and a truncated final
+    # frame is left out of the rebuilt index.
+    with open(copied_file, 'w') as out_file:
+        out_file.write(contents[:-300])
+    assert not loaded.load()
+    xyz = Xyz(copied_file)
+    assert xyz.build_index().n_frames == 11
+    assert xyz.frames().x.shape == (11, 25)
+    os.remove(index.index_file_name)
+    os.remove(copied_file)
+
+
+def test_read_xyz_frames():
+    expected = _read_default_file_name()
+    xyz = Xyz(file_name)
+    for key in (slice(None), slice(None, None, 5), slice(3, 7), [0, 11, 4]):
+        subset = xyz.frames(key)
+        assert np.array_equal(subset.x, expected.x[key])
+        assert np.array_equal(subset.y, expected.y[key])
+        assert np.array_equal(subset.z, expected.z[key])
+        assert np.array_equal(subset.time, expected.time[key])
+        assert np.array_equal(subset.type, expected.type)
+        assert subset.type_dict == expected.type_dict
+        assert np.allclose(subset.box, expected.box)
+
+    last = xyz[-1]
+    assert last.x.shape == (1, 25)
+    assert np.array_equal(last.x[0], expected.x[-1])
+    assert last.time[0] == pytest.approx(3.0, abs=1e-9)
+
+    for empty in (xyz[5:5], xyz[20:], xyz.frames([])):
+        assert empty.x.shape == (0, 25)
+        assert empty.time.shape == (0,)
+        assert np.array_equal(empty.type, expected.type)
+        assert np.allclose(empty.box, expected.box)
+
+    caught = False
+    try:
+        xyz[12]
+    except IndexError:
+        caught = True
+    assert caught
+    os.remove(xyz.index.index_file_name)
+
+
+def test_read_xyz_frames_velocities():
+    file_name_velocities = os.path.join(os.path.dirname(file_name),
+                                        'example_velocities_fort.8')
+    expected = Xyz(file_name_velocities)
+    expected.read_file(silent=True)
+    xyz = Xyz(file_name_velocities)
+    xyz.build_index(save=False)
+    subset = xyz[1:]
+    assert subset.velocities
+    for key in ('x', 'y', 'z', 'vx', 'vy', 'vz'):
+        assert np.array_equal(getattr(subset, key),
+                              getattr(expected, key)[1:])
+
+
+def test_read_xyz_iter_frames():
+    expected = _read_default_file_name()
+    xyz = Xyz(file_name)
+    for chunk in (1, 5, 12, 100):
+        chunks = list(xyz.iter_frames(chunk=chunk))
+        assert len(chunks) == -(-12 // chunk)
+        assert all([len(c.x) <= chunk for c in chunks])
+        for key in ('x', 'y', 'z', 'time'):
+            assert np.array_equal(
+                np.concatenate([getattr(c, key) for c in chunks]),
+                getattr(expected, key)
+            )
+        assert np.array_equal(chunks[-1].type, expected.type)
+        assert chunks[-1].type_dict == expected.type_dict
+
+    for chunk in (0, -1, 2.5):
+        caught = False
+        try:
+            next(xyz.iter_frames(chunk=chunk))
+        except ValueError:
+            caught = True
+        assert caught
+
+
+def test_read_xyz_iter_frames_velocities():
+    file_name_velocities = os.path.join(os.path.dirname(file_name),
+                                        'example_velocities_fort.8')
+    expected = Xyz(file_name_velocities)
+    expected.read_file(silent=True)
+    chunks = list(Xyz(file_name_velocities).iter_frames(chunk=2))
+    for key in ('vx', 'vy', 'vz'):
+        assert np.array_equal(
+            np.concatenate([getattr(c, key) for c in chunks]),
+            getattr(expected, key)
+        )
+
+
+def test_read_xyz_read_file_parallel():
+    expected = _read_default_file_name()
+    for workers in (1, 3):
+        xyz = Xyz(file_name)
+        xyz.read_file_parallel(workers=workers, silent=True)
+        for key in ('x', 'y', 'z', 'time', 'type'):
+            assert np.array_equal(getattr(xyz, key), getattr(expected, key))
+        assert xyz.type_dict == expected.type_dict
+        assert xyz.n_particles == expected.n_particles
+        assert not isinstance(xyz.x, np.memmap)
+
+    out_dir = os.path.join(os.path.dirname(__file__), 'parallel_out')
+    xyz = Xyz(file_name)
+    xyz.read_file_parallel(workers=2, out_dir=out_dir, silent=True)
+    assert isinstance(xyz.x, np.memmap)
+    assert os.path.exists(os.path.join(out_dir, 'x.npy'))
+    assert np.array_equal(np.load(os.path.join(out_dir, 'z.npy')),
+                          expected.z)
+    del xyz
+    shutil.rmtree(out_dir)
+    os.remove(file_name + XyzIndex.extension)
+
+
+def test_read_xyz_read_file_parallel_velocities():
+    file_name_velocities = os.path.join(os.path.dirname(file_name),
+                                        'example_velocities_fort.8')
+    expected = Xyz(file_name_velocities)
+    expected.read_file(silent=True)
+    xyz = Xyz(file_name_velocities)
+    xyz.read_file_parallel(workers=2, silent=True)
+    assert xyz.velocities
+    for key in ('vx', 'vy', 'vz'):
+        assert np.array_equal(getattr(xyz, key), getattr(expected, key))
+    os.remove(file_name_velocities + XyzIndex.extension)
+
+
+def test_read_xyz_read_file_parallel_no_frames():
+    # A header only file, and a file truncated within its first frame.
+    truncated_file = os.path.join(os.path.dirname(__file__),
+                                  'truncated_fort.8')
+    with open(file_name, 'r') as in_file:
+        contents = in_file.readlines()
+    for n_lines in (1, 2, 10):
+        with open(truncated_file, 'w') as out_file:
+            out_file.writelines(contents[:n_lines])
+        xyz = Xyz(truncated_file)
+        caught = False
+        try:
+            xyz.read_file_parallel(workers=2, silent=True)
+        except ValueError:
+            caught = True
+        assert caught
+        os.remove(truncated_file + XyzIndex.extension)
+    os.remove(truncated_file)
+
+
+def test_read_xyz_dtype():
+    expected = _read_default_file_name()
+    assert expected.dtype is None
+    assert expected.x.dtype == np.float64
+    assert expected.type.dtype == np.float64
+
+    xyz = Xyz(file_name, dtype=np.float32)
+    xyz.read_file(silent=True)
+    assert xyz.dtype == 'float32'
+    for key in ('x', 'y', 'z'):
+        assert getattr(xyz, key).dtype == np.float32
+        assert np.array_equal(getattr(xyz, key),
+                              getattr(expected, key).astype(np.float32))
+    assert xyz.time.dtype == np.float64
+    assert xyz.type.dtype == np.uint8
+    assert np.array_equal(xyz.type, expected.type)
+
+    for subset in (xyz[::3], next(xyz.iter_frames(chunk=4))):
+        assert subset.x.dtype == np.float32
+        assert subset.type.dtype == np.uint8
+
+    xyz = Xyz(file_name, dtype='float32')
+    xyz.read_file_parallel(workers=2, silent=True)
+    assert xyz.z.dtype == np.float32
+    assert xyz.time.dtype == np.float64
+    assert np.array_equal(xyz.z, expected.z.astype(np.float32))
+    os.remove(file_name + XyzIndex.extension)